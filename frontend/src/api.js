@@ -159,19 +159,25 @@ export const authAPI = {
 
 export const cartAPI = {
   getCart: () => api.get('/v1/cart/'),
+  // delta: true - в ответе только изменённые позиции, removed и итоги (см. CartContext)
   addItem: (productId, quantity = 1, overrideQuantity = false) => 
     api.post('/v1/cart/add_item/', { 
       product_id: productId, 
       quantity, 
-      override_quantity: overrideQuantity 
+      override_quantity: overrideQuantity,
+      delta: true
     }),
   updateQuantity: (productId, quantity) => 
     api.post('/v1/cart/update_quantity/', { 
       product_id: productId, 
-      quantity 
+      quantity,
+      delta: true
     }),
   removeItem: (productId) => 
-    api.post('/v1/cart/remove_item/', { product_id: productId }),
+    api.post('/v1/cart/remove_item/', { product_id: productId, delta: true }),
+  // operations: [{ op: 'add' | 'set' | 'remove', product_id, quantity }]
+  batch: (operations) => 
+    api.post('/v1/cart/batch/', { operations, delta: true }),
   getQuantity: () => api.get('/v1/cart/get_quantity/'),
   clear: () => api.post('/v1/cart/clear/'),
 };
@@ -1,4 +1,4 @@
-import { createContext, useContext, useState, useEffect, useCallback } from 'react'
+import { createContext, useContext, useState, useEffect, useCallback, useRef } from 'react'
 import { cartAPI } from '../api'
 
 const CartContext = createContext()
@@ -11,10 +11,41 @@ export const useCart = () => {
   return context
 }
 
+// Применяет ответ изменения в режиме delta к текущему состоянию корзины.
+// Возвращает null, если между версиями были другие изменения (например,
+// из соседней вкладки) - тогда корзину нужно загрузить целиком
+const applyCartDelta = (cart, delta) => {
+  if (cart.version === undefined || delta.version !== cart.version + 1) {
+    return null
+  }
+  const changed = new Map(delta.items.map((item) => [item.product_id, item]))
+  const removed = new Set(delta.removed)
+  const items = cart.items
+    .filter((item) => !removed.has(item.product_id))
+    .map((item) => changed.get(item.product_id) || item)
+  const existing = new Set(items.map((item) => item.product_id))
+  delta.items.forEach((item) => {
+    if (!existing.has(item.product_id)) {
+      items.push(item)
+    }
+  })
+  return {
+    items,
+    total_price: delta.total_price,
+    total_quantity: delta.total_quantity,
+    version: delta.version,
+  }
+}
+
 export const CartProvider = ({ children }) => {
   const [cart, setCart] = useState({ items: [], total_price: '0.00', total_quantity: 0 })
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
+  // Последнее состояние корзины для применения delta вне setState
+  const cartRef = useRef(cart)
+  useEffect(() => {
+    cartRef.current = cart
+  }, [cart])
 
   // Загрузить корзину
   const fetchCart = useCallback(async () => {
@@ -38,17 +69,27 @@ export const CartProvider = ({ children }) => {
     }
   }, [])
 
+  // Обновить состояние по ответу изменения (delta или полная корзина)
+  const applyMutation = useCallback((data) => {
+    if (data.removed === undefined) {
+      setCart({ ...data, items: data.items || [] })
+      return
+    }
+    const next = applyCartDelta(cartRef.current, data)
+    if (next === null) {
+      fetchCart()
+    } else {
+      setCart(next)
+    }
+  }, [fetchCart])
+
   // Добавить товар в корзину
   const addItem = useCallback(async (productId, quantity = 1, overrideQuantity = false) => {
     try {
       setLoading(true)
       setError(null)
       const response = await cartAPI.addItem(productId, quantity, overrideQuantity)
-      const cartData = response.data
-      if (!cartData.items) {
-        cartData.items = []
-      }
-      setCart(cartData)
+      applyMutation(response.data)
       return { success: true }
     } catch (err) {
       console.error('Ошибка при добавлении товара в корзину:', err)
@@ -57,7 +98,7 @@ export const CartProvider = ({ children }) => {
     } finally {
       setLoading(false)
     }
-  }, [])
+  }, [applyMutation])
 
   // Обновить количество товара
   const updateQuantity = useCallback(async (productId, quantity) => {
@@ -65,11 +106,7 @@ export const CartProvider = ({ children }) => {
       setLoading(true)
       setError(null)
       const response = await cartAPI.updateQuantity(productId, quantity)
-      const cartData = response.data
-      if (!cartData.items) {
-        cartData.items = []
-      }
-      setCart(cartData)
+      applyMutation(response.data)
       return { success: true }
     } catch (err) {
       console.error('Ошибка при обновлении количества:', err)
@@ -78,7 +115,7 @@ export const CartProvider = ({ children }) => {
     } finally {
       setLoading(false)
     }
-  }, [])
+  }, [applyMutation])
 
   // Удалить товар из корзины
   const removeItem = useCallback(async (productId) => {
@@ -86,11 +123,7 @@ export const CartProvider = ({ children }) => {
       setLoading(true)
       setError(null)
       const response = await cartAPI.removeItem(productId)
-      const cartData = response.data
-      if (!cartData.items) {
-        cartData.items = []
-      }
-      setCart(cartData)
+      applyMutation(response.data)
       return { success: true }
     } catch (err) {
       console.error('Ошибка при удалении товара из корзины:', err)
@@ -99,7 +132,7 @@ export const CartProvider = ({ children }) => {
     } finally {
       setLoading(false)
     }
-  }, [])
+  }, [applyMutation])
 
   // Получить количество товаров в корзине
   const getQuantity = useCallback(async () => {
@@ -117,8 +150,8 @@ export const CartProvider = ({ children }) => {
     try {
       setLoading(true)
       setError(null)
-      await cartAPI.clear()
-      setCart({ items: [], total_price: '0.00', total_quantity: 0 })
+      const response = await cartAPI.clear()
+      setCart({ items: [], total_price: '0.00', total_quantity: 0, version: response.data.version })
       return { success: true }
     } catch (err) {
       console.error('Ошибка при очистке корзины:', err)
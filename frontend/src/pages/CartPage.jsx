@@ -7,7 +7,12 @@ function CartPage() {
   const { cart, loading, error, updateQuantity, removeItem } = useCart()
   const [updatingItems, setUpdatingItems] = useState(new Set())
 
-  const getImageUrl = (product) => {
+  // Уменьшенная копия (WebP) нужного размера; если её ещё нет - оригинал
+  const getImageUrl = (product, size) => {
+    const variant = size && product?.image_variants?.[size]?.webp
+    if (variant) {
+      return variant
+    }
     if (product?.image) {
       if (product.image.startsWith('http')) {
         return product.image
@@ -74,10 +79,15 @@ function CartPage() {
               <div key={product.id} className="cart-card d-flex">
                 <div className="cart-card-img">
                   <img 
-                    src={getImageUrl(product)} 
+                    src={getImageUrl(product, 'thumb')} 
                     alt={product.name}
                     onError={(e) => {
-                      e.target.src = 'http://localhost:8000/static/img/noimage.jpg'
+                      if (!e.target.dataset.fallback) {
+                        e.target.dataset.fallback = 'original'
+                        e.target.src = getImageUrl(product)
+                      } else {
+                        e.target.src = 'http://localhost:8000/static/img/noimage.jpg'
+                      }
                     }}
                   />
                 </div>
@@ -104,7 +104,7 @@ function Home() {
                   </p>
                   <p className="product-category">Категория: {product.category?.name || 'N/A'}</p>
                   <p className="product-status">
-                    {product.available ? '✅ В наличии' : '❌ Нет в наличии'}
+                    {product.available && product.in_stock !== false ? '✅ В наличии' : '❌ Нет в наличии'}
                   </p>
                   {product.description && (
                     <p className="product-description">{product.description.substring(0, 100)}...</p>
@@ -39,7 +39,12 @@ function ProductDetail() {
     }
   }, [slug])
 
-  const getImageUrl = () => {
+  // Уменьшенная копия (WebP) нужного размера; если её ещё нет - оригинал
+  const getImageUrl = (size) => {
+    const variant = size && product?.image_variants?.[size]?.webp
+    if (variant) {
+      return variant
+    }
     if (product?.image) {
       if (product.image.startsWith('http')) {
         return product.image
@@ -99,11 +104,16 @@ function ProductDetail() {
     <div className="detail-product d-flex">
       <div className="detail-img">
         <img 
-          src={getImageUrl()} 
+          src={getImageUrl('detail')} 
           alt={product.name} 
           className="detail-image"
           onError={(e) => {
-            e.target.src = 'http://localhost:8000/static/img/noimage.jpg'
+            if (!e.target.dataset.fallback) {
+              e.target.dataset.fallback = 'original'
+              e.target.src = getImageUrl()
+            } else {
+              e.target.src = 'http://localhost:8000/static/img/noimage.jpg'
+            }
           }}
         />
       </div>
@@ -150,7 +160,7 @@ function ProductDetail() {
             type="submit" 
             className="add-to-cart-btn" 
             value={addingToCart ? 'Adding...' : 'Add to cart'}
-            disabled={addingToCart || !product.available}
+            disabled={addingToCart || !product.available || product.in_stock === false}
           />
           {addToCartMessage && (
             <p className={addToCartMessage.includes('Added') ? 'cart-success-message' : 'cart-error-message'}>
@@ -159,7 +169,7 @@ function ProductDetail() {
           )}
         </form>
         <div className="product-info">
-          <p><strong>Available:</strong> {product.available ? 'Yes' : 'No'}</p>
+          <p><strong>Available:</strong> {product.available && product.in_stock !== false ? 'Yes' : 'No'}</p>
           {product.discount > 0 && (
             <p><strong>Discount:</strong> {product.discount}%</p>
           )}
@@ -118,7 +118,12 @@ function ProductsPage() {
     setSearchParams(newParams)
   }
 
-  const getImageUrl = (product) => {
+  // Уменьшенная копия (WebP) нужного размера; если её ещё нет - оригинал
+  const getImageUrl = (product, size) => {
+    const variant = size && product.image_variants?.[size]?.webp
+    if (variant) {
+      return variant
+    }
     if (product.image) {
       if (product.image.startsWith('http')) {
         return product.image
@@ -174,6 +179,7 @@ function ProductsPage() {
                 onClick={() => handleCategoryClick(category.slug)}
               >
                 {category.name}
+                {category.available_count !== undefined && ` (${category.available_count})`}
               </Link>
             </li>
           ))}
@@ -206,11 +212,16 @@ function ProductsPage() {
                     className="home-card d-flex flex-column align-items-center text-center"
                   >
                     <img 
-                      src={getImageUrl(product)} 
+                      src={getImageUrl(product, 'card')} 
                       className="card-img" 
                       alt={product.name}
                       onError={(e) => {
-                        e.target.src = 'http://localhost:8000/static/img/noimage.jpg'
+                        if (!e.target.dataset.fallback) {
+                          e.target.dataset.fallback = 'original'
+                          e.target.src = getImageUrl(product)
+                        } else {
+                          e.target.src = 'http://localhost:8000/static/img/noimage.jpg'
+                        }
                       }}
                     />
                     <h5 className="title-card">{product.name}</h5>
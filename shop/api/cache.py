@@ -0,0 +1,100 @@
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+from main.cache import get_generations
+
+
+RESPONSE_KEY = 'catalog:response:%s'
+LOCK_SUFFIX = ':lock'
+# Сколько ждём, пока другой запрос пересчитывает тот же ключ
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'waits': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_cache_stats():
+    """Счётчики попаданий/промахов кэша каталога в текущем процессе"""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+    return stats
+
+
+def get_response_key(request, models):
+    """
+    Ключ зависит от хоста, пути, отсортированных параметров запроса
+    и поколений моделей, от которых зависит ответ.
+    """
+    params = sorted(request.query_params.lists())
+    generations = get_generations(*models)
+    raw = '%s|%s|%r|%r' % (request.get_host(), request.path, params, generations)
+    return RESPONSE_KEY % hashlib.sha1(raw.encode()).hexdigest()
+
+
+def cached_response(request, models, compute):
+    """
+    Возвращает закэшированный Response или вычисляет его через compute().
+    Пересчёт одного ключа выполняет только один запрос (single-flight),
+    остальные ждут готовое значение.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return compute()
+
+    key = get_response_key(request, models)
+    data = cache.get(key)
+    if data is not None:
+        _count('hits')
+        return Response(data, headers={'X-Cache': 'HIT'})
+
+    lock_key = key + LOCK_SUFFIX
+    if not cache.add(lock_key, 1, timeout=int(LOCK_WAIT) + 1):
+        _count('waits')
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            data = cache.get(key)
+            if data is not None:
+                _count('hits')
+                return Response(data, headers={'X-Cache': 'HIT'})
+        # Не дождались - считаем сами, но lock не трогаем
+        lock_key = None
+
+    _count('misses')
+    try:
+        response = compute()
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+    finally:
+        if lock_key is not None:
+            cache.delete(lock_key)
+
+
+class CatalogCacheMixin:
+    """
+    Кэширует list/retrieve. Ответ сбрасывается при изменении любой из
+    моделей catalog_cache_models (см. main.signals).
+    """
+    catalog_cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(request, self.catalog_cache_models,
+                               lambda: super(CatalogCacheMixin, self).list(
+                                   request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(request, self.catalog_cache_models,
+                               lambda: super(CatalogCacheMixin, self).retrieve(
+                                   request, *args, **kwargs))
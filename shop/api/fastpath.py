@@ -0,0 +1,190 @@
+from decimal import Decimal, ROUND_HALF_UP
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from rest_framework.response import Response
+from cart.cart import line_total
+from main.images import VARIANT_FORMATS, VARIANT_SIZES, variant_prefix, variants_ready
+from main.money import Money, money_to_json
+
+
+# Колонки, из которых собирается ответ в формате ProductSerializer
+PRODUCT_VALUES = (
+    'id', 'category_id', 'category__name', 'category__slug', 'name', 'slug',
+    'image', 'description', 'price', 'available', 'stock', 'created', 'updated',
+    'discount', 'discounted_price',
+)
+
+TWO_PLACES = Decimal('0.01')
+
+
+def datetime_formatter():
+    """Тот же формат, что у DateTimeField в DRF (ISO 8601, UTC как 'Z')"""
+    tz = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return format_datetime
+
+
+def image_formatter(request):
+    """
+    URL изображения как у ImageField в DRF. Для файлового хранилища
+    базовый URL строится один раз, а не через storage.url() на каждую строку.
+    """
+    if isinstance(default_storage, FileSystemStorage):
+        base = default_storage.url('')
+        if request is not None:
+            base = request.build_absolute_uri(base)
+
+        def format_image(name):
+            if not name:
+                return None
+            return base + filepath_to_uri(name).lstrip('/')
+        return format_image
+
+    def format_image(name):
+        if not name:
+            return None
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return format_image
+
+
+def image_variants(name, format_image):
+    """
+    URL уменьшенных копий: {'thumb': {'jpg': url, 'webp': url}, ...};
+    None, пока варианты не созданы
+    """
+    if not variants_ready(name):
+        return None
+    # URL строится один раз, суффиксы размеров в кодировании не нуждаются
+    prefix = format_image(variant_prefix(name))
+    return {
+        size: {extension: f'{prefix}_{size}.{extension}' for extension in VARIANT_FORMATS}
+        for size in VARIANT_SIZES
+    }
+
+
+def product_row_builder(request=None):
+    """
+    Возвращает функцию values-строка -> dict в том же виде, что ProductSerializer.
+    Всё, что не зависит от строки (часовой пояс, базовый URL медиа),
+    вычисляется один раз здесь.
+    """
+    format_datetime = datetime_formatter()
+    format_image = image_formatter(request)
+
+    def build(row):
+        return {
+            'id': row['id'],
+            'category': {
+                'id': row['category_id'],
+                'name': row['category__name'],
+                'slug': row['category__slug'],
+            },
+            'name': row['name'],
+            'slug': row['slug'],
+            'image': format_image(row['image']),
+            'image_variants': image_variants(row['image'], format_image),
+            'description': row['description'],
+            'price': float(row['price']),
+            'available': row['available'],
+            'in_stock': row['stock'] is None or row['stock'] > 0,
+            'created': format_datetime(row['created']),
+            'updated': format_datetime(row['updated']),
+            'discount': str(row['discount'].quantize(TWO_PLACES, rounding=ROUND_HALF_UP)),
+            'sell_price': float(row['discounted_price']),
+        }
+    return build
+
+
+def cart_data(items, request=None, include=None):
+    """
+    Корзина в формате CartSerializer за один проход по позициям
+    (словарям из Cart.__iter__ с загруженным product.category).
+    Итоги считаются по всем позициям, а в items попадают только те,
+    для которых include(product_id) истинно (по умолчанию - все).
+    Словарь категории строится один раз на категорию.
+    """
+    format_datetime = datetime_formatter()
+    format_image = image_formatter(request)
+    categories = {}
+    lines = []
+    # Итоги - целые числа центов (см. main.money)
+    total_cents = 0
+    total_quantity = 0
+    for item in items:
+        product = item['product']
+        quantity = item['quantity']
+        total_cents += line_total(item).cents
+        total_quantity += quantity
+        if include is not None and not include(product.id):
+            continue
+        category = categories.get(product.category_id)
+        if category is None:
+            category = categories[product.category_id] = {
+                'id': product.category_id,
+                'name': product.category.name,
+                'slug': product.category.slug,
+            }
+        image_name = product.image.name
+        image = format_image(image_name)
+        variants = image_variants(image_name, format_image)
+        lines.append({
+            'product': {
+                'id': product.id,
+                'category': category,
+                'name': product.name,
+                'slug': product.slug,
+                'image': image,
+                'image_variants': variants,
+                'description': product.description,
+                'price': float(product.price),
+                'available': product.available,
+                'in_stock': product.in_stock,
+                'created': format_datetime(product.created),
+                'updated': format_datetime(product.updated),
+                'discount': str(product.discount.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)),
+                'sell_price': money_to_json(product.sell_price()),
+            },
+            'product_id': product.id,
+            'product_name': product.name,
+            'product_slug': product.slug,
+            'product_price': float(product.price),
+            'product_image': image,
+            'product_image_variants': variants,
+            'quantity': quantity,
+            'total_price': money_to_json(item['total_price']),
+        })
+    return {
+        'items': lines,
+        'total_price': money_to_json(Money(total_cents)),
+        'total_quantity': total_quantity,
+    }
+
+
+def product_list_response(view, queryset):
+    """
+    Отдаёт (с пагинацией view) список товаров, минуя ModelSerializer:
+    одна выборка values() и готовая функция сборки строки.
+    """
+    # Аннотации (например, rank поиска) нужны курсору keyset-пагинации
+    rows = queryset.prefetch_related(None).values(
+        *PRODUCT_VALUES, *queryset.query.annotation_select)
+    build = product_row_builder(view.request)
+    page = view.paginate_queryset(rows)
+    if page is not None:
+        return view.get_paginated_response([build(row) for row in page])
+    return Response([build(row) for row in rows])
+
+
+class ProductFastListMixin:
+    """list() для товаров через product_list_response (только чтение)"""
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return product_list_response(self, queryset)
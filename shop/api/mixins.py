@@ -0,0 +1,226 @@
+import hashlib
+from calendar import timegm
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max, Prefetch, prefetch_related_objects
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import serializers
+from main.cache import get_generations
+
+
+# План загрузки зависит только от класса сериализатора, поэтому считаем его один раз
+_eager_loading_plans = {}
+
+
+def _resolve_relation(model, source):
+    """
+    Возвращает (путь для ORM, поле связи) для source вида 'user' или 'order.user'.
+    Если source не является связью модели (свойство, метод и т.п.) - (None, None).
+    """
+    path = []
+    field = None
+    for name in source.split('.'):
+        if field is not None:
+            # Промежуточные звенья допустимы только как FK/OneToOne
+            if not (field.many_to_one or field.one_to_one):
+                return None, None
+            model = field.related_model
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None, None
+        if not field.is_relation:
+            return None, None
+        path.append(name)
+    return '__'.join(path), field
+
+
+def _collect(serializer, model, prefix, select, prefetch):
+    """Рекурсивно обходит поля сериализатора и заполняет select/prefetch"""
+    meta = getattr(serializer, 'Meta', None)
+    # Подсказки для связей, которые используются в SerializerMethodField
+    select.extend(prefix + path for path in getattr(meta, 'select_related', ()))
+    prefetch.extend((prefix + path, None, None)
+                    for path in getattr(meta, 'prefetch_related', ()))
+
+    for field in serializer.fields.values():
+        if field.write_only or not field.source or field.source == '*':
+            continue
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            # DRF берёт pk из attname и не обращается к связанному объекту
+            continue
+        path, relation = _resolve_relation(model, field.source)
+        if relation is None:
+            continue
+        single = relation.many_to_one or relation.one_to_one
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child
+            if single or not isinstance(child, serializers.ModelSerializer):
+                continue
+            sub_select, sub_prefetch = [], []
+            _collect(child, relation.related_model, '', sub_select, sub_prefetch)
+            prefetch.append((prefix + path, relation.related_model,
+                             (sub_select, sub_prefetch)))
+        elif isinstance(field, serializers.ModelSerializer):
+            if single:
+                select.append(prefix + path)
+                _collect(field, relation.related_model, prefix + path + '__',
+                         select, prefetch)
+        elif isinstance(field, serializers.ManyRelatedField):
+            if not single:
+                prefetch.append((prefix + path, None, None))
+        elif isinstance(field, serializers.RelatedField):
+            if single:
+                select.append(prefix + path)
+
+
+def get_eager_loading_plan(serializer_class):
+    """
+    Строит план загрузки для сериализатора: список путей для select_related
+    и список (путь, модель, вложенный план) для prefetch_related.
+    """
+    plan = _eager_loading_plans.get(serializer_class)
+    if plan is None:
+        serializer = serializer_class()
+        select, prefetch = [], []
+        _collect(serializer, serializer.Meta.model, '', select, prefetch)
+        plan = _eager_loading_plans[serializer_class] = (select, prefetch)
+    return plan
+
+
+def _build_prefetches(prefetch):
+    """Превращает план в объекты Prefetch с уже оптимизированными queryset"""
+    lookups = []
+    for path, model, sub_plan in prefetch:
+        if model is None:
+            lookups.append(path)
+        else:
+            queryset = _apply_plan(model._default_manager.all(), sub_plan)
+            lookups.append(Prefetch(path, queryset=queryset))
+    return lookups
+
+
+def _apply_plan(queryset, plan):
+    select, prefetch = plan
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*_build_prefetches(prefetch))
+    return queryset
+
+
+def optimize_queryset(queryset, serializer_class):
+    """Добавляет к queryset select_related/prefetch_related под сериализатор"""
+    return _apply_plan(queryset, get_eager_loading_plan(serializer_class))
+
+
+def eager_load(instances, serializer_class):
+    """
+    То же для уже загруженных объектов (например, созданного заказа),
+    перед тем как отдать их сериализатору напрямую.
+    """
+    select, prefetch = get_eager_loading_plan(serializer_class)
+    prefetch_related_objects(list(instances), *select, *_build_prefetches(prefetch))
+
+
+class EagerLoadingMixin:
+    """
+    Миксин для ModelViewSet: автоматически подгружает связи, которые нужны
+    сериализатору, чтобы число запросов на страницу не зависело от её размера.
+    """
+
+    def setup_eager_loading(self, queryset):
+        return optimize_queryset(queryset, self.get_serializer_class())
+
+    def filter_queryset(self, queryset):
+        return self.setup_eager_loading(super().filter_queryset(queryset))
+
+
+class ConditionalGetMixin:
+    """
+    Поддержка If-None-Match / If-Modified-Since для list и retrieve.
+    Если модель view сама есть в conditional_generation_models, ETag
+    строится только из поколений (их увеличивают post_save, post_delete
+    и queryset.update()), параметров запроса и пользователя - без запросов
+    к БД, поэтому 304 и попадание в кэш каталога не трогают таблицу.
+    Иначе (заказы) добавляется один агрегирующий запрос: MAX по полям
+    времени и COUNT (COUNT не считается в режиме курсора пагинации).
+    Last-Modified отдаётся только для retrieve во view без поколений:
+    MAX(updated) не сдвигается ни при удалении из списка, ни при update(),
+    и If-Modified-Since по нему давал бы устаревший 304.
+    """
+    conditional_timestamp_fields = ('updated',)
+    conditional_generation_models = ()
+    # Ответ зависит от пользователя (заказы) - не кэшировать в общих кэшах
+    conditional_private = False
+
+    def uses_generations_only(self):
+        return self.get_queryset().model in self.conditional_generation_models
+
+    def get_conditional_state(self, queryset, count=True):
+        """Агрегаты для ETag: COUNT (если count) и MAX по полям времени"""
+        aggregates = {'count': Count('pk')} if count else {}
+        for index, field in enumerate(self.conditional_timestamp_fields):
+            aggregates['modified_%d' % index] = Max(field)
+        if not aggregates:
+            return None, []
+        row = queryset.order_by().aggregate(**aggregates)
+        timestamps = [row['modified_%d' % index]
+                      for index in range(len(self.conditional_timestamp_fields))]
+        return row.get('count'), [value for value in timestamps if value is not None]
+
+    def get_conditional_validators(self, get_queryset, with_last_modified=True, count=True):
+        count_value, timestamps = None, []
+        if not self.uses_generations_only():
+            count_value, timestamps = self.get_conditional_state(get_queryset(), count)
+        last_modified = None
+        if with_last_modified and timestamps and not self.conditional_generation_models:
+            last_modified = timegm(max(timestamps).utctimetuple())
+
+        generations = get_generations(*self.conditional_generation_models) \
+            if self.conditional_generation_models else ()
+        raw = repr((
+            self.request.path,
+            sorted(self.request.query_params.lists()),
+            self.request.user.pk,
+            count_value,
+            [value.isoformat() for value in timestamps],
+            generations,
+        ))
+        etag = 'W/"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+        return etag, last_modified
+
+    def conditional_response(self, get_queryset, compute, with_last_modified=True, count=True):
+        etag, last_modified = self.get_conditional_validators(
+            get_queryset, with_last_modified, count)
+        response = get_conditional_response(self.request, etag=etag,
+                                            last_modified=last_modified)
+        if response is None:
+            response = compute()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Браузер должен каждый раз сверять ETag, а не брать копию из кэша
+            if self.conditional_private:
+                patch_cache_control(response, no_cache=True, private=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        paginator = self.paginator
+        # В режиме курсора пагинация сама не считает COUNT - и ETag тоже
+        cursor = paginator is not None and getattr(paginator, 'wants_cursor', None) is not None \
+            and paginator.wants_cursor(request)
+        return self.conditional_response(
+            lambda: self.filter_queryset(self.get_queryset()),
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+            with_last_modified=False, count=not cursor)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.conditional_response(
+            lambda: self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}),
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,220 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Пагинация для каталога, поиска и заказов.
+
+    По умолчанию работает как обычная PageNumberPagination (?page=N).
+    ?pagination=cursor включает keyset-пагинацию: страница выбирается условием
+    по полям сортировки (WHERE (name, id) > (...)), а не OFFSET, поэтому
+    глубокие страницы стоят столько же, сколько первая. Дальше клиент ходит
+    по ссылкам next/previous с непрозрачным ?cursor=...
+
+    ?count=false отключает COUNT(*) в постраничном режиме,
+    ?count=true добавляет count в режиме курсора (по умолчанию его нет).
+    """
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.use_cursor = self.wants_cursor(request)
+        self.count = None
+        self.page_without_count = None
+        if self.use_cursor:
+            return self.paginate_by_cursor(queryset, request)
+        if not self.get_count_flag(request, default=True):
+            return self.paginate_without_count(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def wants_cursor(self, request):
+        """Режим курсора: ?pagination=cursor или уже полученный ?cursor=..."""
+        return (self.cursor_query_param in request.query_params
+                or request.query_params.get(self.mode_query_param) == 'cursor')
+
+    def get_count_flag(self, request, default):
+        value = request.query_params.get(self.count_query_param)
+        if value is None:
+            return default
+        return value.lower() not in ('false', '0', 'no')
+
+    def get_paginated_response(self, data):
+        if self.use_cursor:
+            response = OrderedDict()
+            if self.count is not None:
+                response['count'] = self.count
+            response['next'] = self.get_next_cursor_link()
+            response['previous'] = self.get_previous_cursor_link()
+            response['results'] = data
+            return Response(response)
+        if self.page_without_count is not None:
+            return Response(OrderedDict([
+                ('next', self.get_next_link()),
+                ('previous', self.get_previous_link()),
+                ('results', data),
+            ]))
+        return super().get_paginated_response(data)
+
+    # Постраничный режим без COUNT(*)
+
+    def paginate_without_count(self, queryset, request):
+        page_size = self.get_page_size(request)
+        try:
+            number = int(request.query_params.get(self.page_query_param, 1))
+        except (TypeError, ValueError):
+            number = 0
+        if number < 1:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=number, message='Invalid page.'))
+        offset = (number - 1) * page_size
+        # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.page_without_count = number
+        self.has_next_page = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if self.page_without_count is None:
+            return super().get_next_link()
+        if not self.has_next_page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param,
+                                   self.page_without_count + 1)
+
+    def get_previous_link(self):
+        if self.page_without_count is None:
+            return super().get_previous_link()
+        if self.page_without_count == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_without_count == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param,
+                                   self.page_without_count - 1)
+
+    # Keyset-режим
+
+    def get_ordering(self, queryset):
+        """
+        Поля сортировки queryset + id в качестве tiebreaker.
+        Направление id совпадает с направлением последнего поля.
+        """
+        if queryset.query.order_by:
+            ordering = list(queryset.query.order_by)
+        elif queryset.query.default_ordering:
+            ordering = list(queryset.model._meta.ordering)
+        else:
+            ordering = []
+        if not all(isinstance(field, str) for field in ordering):
+            raise NotFound('Cursor pagination is not supported for this ordering')
+        names = [field.lstrip('-') for field in ordering]
+        if 'id' not in names and 'pk' not in names:
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-id' if descending else 'id')
+        return ordering
+
+    def paginate_by_cursor(self, queryset, request):
+        page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+        if self.get_count_flag(request, default=False):
+            self.count = queryset.count()
+
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position, reverse))
+        if reverse:
+            queryset = queryset.reverse()
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.first_position = self.get_position(rows[0]) if rows else position
+        self.last_position = self.get_position(rows[-1]) if rows else position
+        return rows
+
+    def position_filter(self, position, reverse):
+        """
+        Условие "строго после позиции" для лексикографического порядка:
+        (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = '%s__%s' % (name, 'lt' if descending else 'gt')
+            condition |= equal & Q(**{lookup: value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position(self, row):
+        """Значения полей сортировки для объекта или словаря из values()"""
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if isinstance(row, dict):
+                value = row[name]
+            else:
+                value = row
+                for attr in name.split('__'):
+                    value = getattr(value, attr)
+            position.append(value)
+        return position
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': position, 'o': self.ordering}
+        if reverse:
+            payload['r'] = 1
+        data = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            payload = json.loads(data)
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+            # Курсор от другой сортировки применять нельзя
+            if (payload.get('o') != self.ordering or not isinstance(position, list)
+                    or len(position) != len(self.ordering)):
+                raise ValueError('cursor does not match ordering')
+        except (TypeError, ValueError, KeyError, AttributeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_cursor_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.first_position, reverse=True)
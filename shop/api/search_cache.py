@@ -0,0 +1,248 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from decimal import Decimal, InvalidOperation
+from functools import wraps
+from django.conf import settings
+from rest_framework.response import Response
+from main.analytics import record_search
+from main.cache import get_generations
+from main.models import Category, Product
+
+
+# Параметры, которые приводятся к каноническому виду; остальные входят в ключ
+# без пробелов по краям. Правила должны совпадать с тем, как их читает
+# SearchViewSet.search, иначе разные запросы получат один ключ:
+# q ищется без учёта регистра, а category (slug) сравнивается точно
+TEXT_PARAMS = ('q',)
+PRICE_PARAMS = ('min_price', 'max_price')
+BOOLEAN_PARAMS = ('available', 'facets')
+TRUE_VALUES = ('true', '1', 'yes')
+
+
+def parse_boolean(value):
+    """Булев параметр запроса - одно правило для фильтра и для ключа кэша"""
+    return value.strip().lower() in TRUE_VALUES
+
+
+def _normalize_text(value):
+    return ' '.join(value.lower().split())
+
+
+def _normalize_price(value):
+    try:
+        price = Decimal(value.strip())
+    except InvalidOperation:
+        # Некорректное значение - view вернёт 400, ключ просто должен быть стабильным
+        return value
+    if not price.is_finite():
+        return value
+    # 10, 10.0 и 10.00 - один и тот же фильтр
+    return str(price.normalize()) if price else '0'
+
+
+def normalize_search_params(query_params):
+    """
+    Канонический ключ поискового запроса: текст в нижнем регистре
+    с одиночными пробелами, цены без лишних нулей, булевы флаги как
+    true/false, параметры отсортированы. Пустые параметры отбрасываются.
+    """
+    items = []
+    for name, values in query_params.lists():
+        value = values[-1]
+        if name in TEXT_PARAMS:
+            value = _normalize_text(value)
+        elif name in PRICE_PARAMS:
+            value = _normalize_price(value)
+        elif name in BOOLEAN_PARAMS:
+            value = 'true' if parse_boolean(value) else 'false'
+        elif name == 'price_buckets':
+            value = ','.join(sorted({_normalize_price(bound) for bound in value.split(',')
+                                     if bound.strip()}))
+        else:
+            value = value.strip()
+        if value:
+            items.append((name, value))
+    return tuple(sorted(items))
+
+
+class LFUCache:
+    """
+    Кэш фиксированного размера с вытеснением наименее часто используемых
+    записей (среди равных по частоте - давнее использованной). Все операции O(1):
+    записи сгруппированы по частоте в OrderedDict, min_frequency - наименьшая.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.frequencies = {}
+        self.min_frequency = 0
+        self.evictions = 0
+
+    def _touch(self, key):
+        value, frequency = self.entries[key]
+        bucket = self.frequencies[frequency]
+        del bucket[key]
+        if not bucket:
+            del self.frequencies[frequency]
+            if self.min_frequency == frequency:
+                self.min_frequency = frequency + 1
+        self.entries[key] = (value, frequency + 1)
+        self.frequencies.setdefault(frequency + 1, OrderedDict())[key] = None
+        return value
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+            return self._touch(key)
+
+    def set(self, key, value):
+        if self.capacity <= 0:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._touch(key)
+                self.entries[key] = (value, self.entries[key][1])
+                return
+            if len(self.entries) >= self.capacity:
+                bucket = self.frequencies[self.min_frequency]
+                evicted, _ = bucket.popitem(last=False)
+                if not bucket:
+                    del self.frequencies[self.min_frequency]
+                del self.entries[evicted]
+                self.evictions += 1
+            self.entries[key] = (value, 1)
+            self.frequencies.setdefault(1, OrderedDict())[key] = None
+            self.min_frequency = 1
+
+    def delete(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return
+            frequency = self.entries.pop(key)[1]
+            bucket = self.frequencies[frequency]
+            del bucket[key]
+            if not bucket:
+                del self.frequencies[frequency]
+                if self.min_frequency == frequency:
+                    self.min_frequency = min(self.frequencies, default=0)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.frequencies.clear()
+            self.min_frequency = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SearchCache:
+    """
+    Кэш страниц поиска в памяти процесса. Запись хранит поколения Product
+    и Category на момент вычисления и считается устаревшей, если каталог
+    с тех пор изменился. Заодно считает популярность запросов.
+    """
+    models = (Product, Category)
+
+    def __init__(self, capacity, max_tracked_queries):
+        self.results = LFUCache(capacity)
+        self.max_tracked_queries = max_tracked_queries
+        self.queries = Counter()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = 0
+
+    def track(self, text):
+        if not text:
+            return
+        with self.lock:
+            self.queries[text] += 1
+            if len(self.queries) > self.max_tracked_queries:
+                # Оставляем более популярную половину
+                self.queries = Counter(dict(
+                    self.queries.most_common(self.max_tracked_queries // 2)))
+
+    def get(self, key, generations):
+        entry = self.results.get(key)
+        if entry is not None and entry[0] != generations:
+            self.results.delete(key)
+            entry = None
+            with self.lock:
+                self.invalidations += 1
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry[1] if entry is not None else None
+
+    def set(self, key, generations, data):
+        self.results.set(key, (generations, data))
+
+    def stats(self, top=20):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.results),
+                'capacity': self.results.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self.results.evictions,
+                'top_queries': [{'query': text, 'count': count}
+                                for text, count in self.queries.most_common(top)],
+            }
+
+
+search_cache = SearchCache(settings.SEARCH_CACHE_SIZE, settings.SEARCH_STATS_MAX_QUERIES)
+
+
+def search_cached(func):
+    """Декоратор для search: ответ берётся из search_cache по нормализованному ключу"""
+    @wraps(func)
+    def wrapper(self, request, *args, **kwargs):
+        params = normalize_search_params(request.query_params)
+        search_cache.track(dict(params).get('q'))
+        # Хост входит в ключ: в ответе абсолютные ссылки
+        key = (request.get_host(), request.path, params)
+        generations = get_generations(*search_cache.models)
+        data = search_cache.get(key, generations)
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+        response = func(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            search_cache.set(key, generations, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+def search_instrumented(func):
+    """
+    Декоратор для search: замеряет время ответа (включая попадания в кэш)
+    и записывает событие в буфер main.analytics.
+    """
+    @wraps(func)
+    def wrapper(self, request, *args, **kwargs):
+        started = time.perf_counter()
+        response = func(self, request, *args, **kwargs)
+        latency_ms = (time.perf_counter() - started) * 1000
+        if response.status_code == 200:
+            params = dict(normalize_search_params(request.query_params))
+            query = params.pop('q', '')
+            result_count = response.data.get('count')
+            if result_count is not None:
+                zero_results = result_count == 0
+            else:
+                # Без count пустой ответ значит "ничего не найдено" только на первой странице
+                zero_results = (not response.data.get('results')
+                                and 'cursor' not in params
+                                and params.get('page', '1') == '1')
+            record_search(query, params, result_count, zero_results, latency_ms,
+                          cached=response.get('X-Cache') == 'HIT')
+        return response
+    return wrapper
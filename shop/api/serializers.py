@@ -3,6 +3,22 @@ from decimal import Decimal
 from main.models import Category, Product
 from users.models import User
 from orders.models import Order, OrderItem
+from main.money import money_to_json
+from .fastpath import cart_data, image_formatter, image_variants
+
+
+class MoneyField(serializers.DecimalField):
+    """
+    Денежная сумма: на вход - как DecimalField (до центов), в JSON -
+    число через main.money.money_to_json. Принимает Money, Decimal и
+    методы модели, возвращающие Money (source='get_cost').
+    """
+
+    def __init__(self, max_digits=12, decimal_places=2, **kwargs):
+        super().__init__(max_digits=max_digits, decimal_places=decimal_places, **kwargs)
+
+    def to_representation(self, value):
+        return money_to_json(value)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -13,6 +29,39 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug']
 
 
+class CategoryStatsSerializer(CategorySerializer):
+    """
+    Категория с количеством товаров и диапазоном цен.
+    Статистика передаётся в context['category_stats'] (см. main.stats).
+    """
+    product_count = serializers.SerializerMethodField()
+    available_count = serializers.SerializerMethodField()
+    min_price = serializers.SerializerMethodField()
+    max_price = serializers.SerializerMethodField()
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + [
+            'product_count', 'available_count', 'min_price', 'max_price'
+        ]
+
+    def _stats(self, obj):
+        return self.context.get('category_stats', {}).get(obj.id, {})
+
+    def get_product_count(self, obj):
+        return self._stats(obj).get('product_count', 0)
+
+    def get_available_count(self, obj):
+        return self._stats(obj).get('available_count', 0)
+
+    def get_min_price(self, obj):
+        price = self._stats(obj).get('min_price')
+        return float(price) if price is not None else None
+
+    def get_max_price(self, obj):
+        price = self._stats(obj).get('max_price')
+        return float(price) if price is not None else None
+
+
 class ProductSerializer(serializers.ModelSerializer):
     """Сериализатор для модели Product"""
     category = CategorySerializer(read_only=True)
@@ -21,30 +70,62 @@ class ProductSerializer(serializers.ModelSerializer):
         source='category',
         write_only=True
     )
-    price = serializers.SerializerMethodField()
-    sell_price = serializers.SerializerMethodField()
+    price = MoneyField(read_only=True)
+    # Product.sell_price() - Money с тем же округлением, что колонка discounted_price
+    sell_price = MoneyField(read_only=True)
+    image_variants = serializers.SerializerMethodField()
+    # Точный остаток не отдаётся: он меняется с каждым заказом
+    in_stock = serializers.BooleanField(read_only=True)
     
     class Meta:
         model = Product
         fields = [
             'id', 'category', 'category_id', 'name', 'slug', 
-            'image', 'description', 'price', 'available', 
-            'created', 'updated', 'discount', 'sell_price'
+            'image', 'image_variants', 'description', 'price', 'available', 
+            'in_stock', 'created', 'updated', 'discount', 'sell_price'
         ]
         read_only_fields = ['created', 'updated']
     
-    def get_price(self, obj):
-        """Конвертирует Decimal в float для JSON сериализации"""
-        return float(obj.price) if isinstance(obj.price, Decimal) else obj.price
-    
-    def get_sell_price(self, obj):
-        """Вычисляет цену со скидкой"""
-        if obj.discount:
-            result = round(obj.price - obj.price * obj.discount / 100, 2)
-            # Конвертируем Decimal в float для JSON сериализации
-            return float(result) if isinstance(result, Decimal) else result
-        # Конвертируем Decimal в float
-        return float(obj.price) if isinstance(obj.price, Decimal) else obj.price
+    def get_image_variants(self, obj):
+        """URL уменьшенных копий изображения (thumb/card/detail в JPEG и WebP)"""
+        format_image = getattr(self, '_format_image', None)
+        if format_image is None:
+            # Базовый URL считается один раз на сериализатор, а не на каждый товар
+            format_image = self._format_image = image_formatter(self.context.get('request'))
+        return image_variants(obj.image.name, format_image)
+
+
+class ProductBulkUpdateSerializer(serializers.Serializer):
+    """Сериализатор для массового изменения цен, скидок и доступности"""
+    # Фильтры (хотя бы один или all=true)
+    category = serializers.SlugField(required=False)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False,
+                                allow_empty=False)
+    name = serializers.CharField(required=False)
+    all = serializers.BooleanField(required=False, default=False)
+    # Изменения
+    price = serializers.DecimalField(max_digits=10, decimal_places=2,
+                                     min_value=Decimal('0'), required=False)
+    price_percent = serializers.DecimalField(max_digits=6, decimal_places=2,
+                                             min_value=Decimal('-99.99'),
+                                             max_value=Decimal('1000'), required=False)
+    discount = serializers.DecimalField(max_digits=4, decimal_places=2,
+                                        min_value=Decimal('0'), required=False)
+    available = serializers.BooleanField(required=False)
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        """Проверка, что задан фильтр и хотя бы одно изменение"""
+        if not (attrs.get('all') or any(key in attrs for key in ('category', 'ids', 'name'))):
+            raise serializers.ValidationError(
+                "Specify category, ids or name filter (or all=true)")
+        if 'price' in attrs and 'price_percent' in attrs:
+            raise serializers.ValidationError(
+                "price and price_percent are mutually exclusive")
+        if not any(key in attrs for key in ('price', 'price_percent', 'discount', 'available')):
+            raise serializers.ValidationError(
+                "Nothing to update: specify price, price_percent, discount or available")
+        return attrs
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -122,6 +203,19 @@ class PasswordChangeSerializer(serializers.Serializer):
         return attrs
 
 
+class OrderItemListSerializer(serializers.ListSerializer):
+    """
+    Позиции заказа. Только что созданные позиции (create_order_items)
+    передаются в context['order_items'] и сериализуются без запроса к БД.
+    """
+
+    def get_attribute(self, instance):
+        items = self.context.get('order_items')
+        if items is not None:
+            return items
+        return super().get_attribute(instance)
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     """Сериализатор для модели OrderItem"""
     product = ProductSerializer(read_only=True)
@@ -130,7 +224,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
         source='product',
         write_only=True
     )
-    cost = serializers.SerializerMethodField()
+    price = MoneyField(max_digits=10)
+    cost = MoneyField(source='get_cost', read_only=True)
     
     class Meta:
         model = OrderItem
@@ -138,24 +233,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'id', 'product', 'product_id', 'price', 
             'quantity', 'cost'
         ]
-    
-    def to_representation(self, instance):
-        """Конвертируем Decimal поля в float для JSON сериализации"""
-        data = super().to_representation(instance)
-        if 'price' in data and data['price'] is not None:
-            # price может быть Decimal или уже float
-            if isinstance(data['price'], str):
-                try:
-                    data['price'] = float(data['price'])
-                except (ValueError, TypeError):
-                    pass
-        return data
-    
-    def get_cost(self, obj):
-        """Вычисляет общую стоимость позиции"""
-        cost = obj.get_cost()
-        # Конвертируем Decimal в float для JSON сериализации
-        return float(cost) if isinstance(cost, Decimal) else cost
+        list_serializer_class = OrderItemListSerializer
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -169,200 +247,84 @@ class OrderSerializer(serializers.ModelSerializer):
         allow_null=True
     )
     items = OrderItemSerializer(many=True, read_only=True)
-    total_cost = serializers.SerializerMethodField()
+    # Хранится в заказе - позиции не перебираются
+    total_cost = MoneyField(source='get_total_cost', read_only=True)
     
     class Meta:
         model = Order
         fields = [
             'id', 'user', 'user_id', 'first_name', 'last_name',
             'email', 'city', 'address', 'postal_code', 'created',
-            'updated', 'paid', 'items', 'total_cost'
+            'updated', 'paid', 'reserved_until', 'items', 'total_cost',
+            'item_count'
         ]
-        read_only_fields = ['created', 'updated']
-    
-    def get_total_cost(self, obj):
-        """Вычисляет общую стоимость заказа"""
-        total = obj.get_total_cost()
-        # Конвертируем Decimal в float для JSON сериализации
-        return float(total) if isinstance(total, Decimal) else total
+        read_only_fields = ['created', 'updated', 'reserved_until', 'item_count']
 
 
 class CartItemSerializer(serializers.Serializer):
-    """Сериализатор для позиции корзины (работает со словарями из сессионной корзины)"""
-    # Используем ProductSerializer, но с кастомным to_representation для image
-    product = serializers.SerializerMethodField()
-    product_id = serializers.SerializerMethodField()
-    product_name = serializers.SerializerMethodField()
-    product_slug = serializers.SerializerMethodField()
-    product_price = serializers.SerializerMethodField()
-    product_image = serializers.SerializerMethodField()
+    """
+    Позиция корзины (словарь из Cart.__iter__): product в формате
+    ProductSerializer, плоские product_* поля, quantity и total_price.
+    """
     quantity = serializers.IntegerField(min_value=1, max_value=10)
-    total_price = serializers.SerializerMethodField()
-    
-    def get_product(self, obj):
-        """Сериализуем product через ProductSerializer, но без бинарных данных image"""
-        product = obj.get('product') if isinstance(obj, dict) else getattr(obj, 'product', None)
-        if product:
-            # Используем ProductSerializer, но с кастомной обработкой
-            serializer = ProductSerializer(product)
-            data = serializer.data
-            # Убеждаемся что image это строка (URL), а не бинарные данные
-            if 'image' in data and data['image']:
-                # Если image это не строка, конвертируем в URL
-                if not isinstance(data['image'], str):
-                    try:
-                        if hasattr(product.image, 'url'):
-                            data['image'] = product.image.url
-                        elif hasattr(product.image, 'name'):
-                            data['image'] = product.image.name
-                        else:
-                            data['image'] = str(product.image) if product.image else None
-                    except:
-                        data['image'] = None
-            return data
-        return None
-    
-    def get_product_id(self, obj):
-        """Получаем ID продукта"""
-        product = obj.get('product') if isinstance(obj, dict) else getattr(obj, 'product', None)
-        if product:
-            return product.id if hasattr(product, 'id') else None
-        return None
-    
-    def get_product_name(self, obj):
-        """Получаем название продукта"""
-        product = obj.get('product') if isinstance(obj, dict) else getattr(obj, 'product', None)
-        if product:
-            return product.name if hasattr(product, 'name') else None
-        return None
-    
-    def get_product_slug(self, obj):
-        """Получаем slug продукта"""
-        product = obj.get('product') if isinstance(obj, dict) else getattr(obj, 'product', None)
-        if product:
-            return product.slug if hasattr(product, 'slug') else None
-        return None
-    
-    def get_product_price(self, obj):
-        """Получаем цену продукта"""
-        product = obj.get('product') if isinstance(obj, dict) else getattr(obj, 'product', None)
-        if product and hasattr(product, 'price'):
-            price = product.price
-            return float(price) if isinstance(price, Decimal) else price
-        # Если нет product, используем price из словаря
-        price = obj.get('price') if isinstance(obj, dict) else getattr(obj, 'price', None)
-        if price:
-            return float(price) if isinstance(price, Decimal) else price
-        return 0.0
-    
-    def get_product_image(self, obj):
-        """Возвращаем только URL или имя файла изображения, не бинарные данные"""
-        product = obj.get('product') if isinstance(obj, dict) else getattr(obj, 'product', None)
-        if product and hasattr(product, 'image') and product.image:
-            # Возвращаем строку - URL или имя файла, не объект ImageField
-            try:
-                # Пытаемся получить URL изображения
-                if hasattr(product.image, 'url'):
-                    return product.image.url
-                # Если нет URL, возвращаем имя файла
-                elif hasattr(product.image, 'name'):
-                    return product.image.name
-                # В крайнем случае - строковое представление
-                else:
-                    return str(product.image) if product.image else None
-            except (ValueError, AttributeError):
-                # Если ошибка при получении URL, возвращаем None
-                return None
-        return None
-    
-    def get_total_price(self, obj):
-        """Вычисляем общую стоимость позиции"""
-        # Используем total_price из словаря, если он есть
-        if isinstance(obj, dict) and 'total_price' in obj:
-            total = obj['total_price']
-            # Всегда конвертируем Decimal в float
-            if isinstance(total, Decimal):
-                return float(total)
-            elif isinstance(total, (int, float)):
-                return float(total)
-            else:
-                try:
-                    return float(total)
-                except (ValueError, TypeError):
-                    return 0.0
-        
-        # Альтернативный расчет
-        product = obj.get('product') if isinstance(obj, dict) else getattr(obj, 'product', None)
-        quantity = obj.get('quantity') if isinstance(obj, dict) else getattr(obj, 'quantity', 0)
-        
-        if product and hasattr(product, 'price'):
-            price = product.price
-            if product.discount:
-                sell_price = product.sell_price()
-                if isinstance(sell_price, Decimal):
-                    sell_price = float(sell_price)
-                total = sell_price * quantity
-            else:
-                if isinstance(price, Decimal):
-                    price = float(price)
-                total = price * quantity
-            return float(total) if isinstance(total, Decimal) else total
-        
-        return 0.0
+
+    def to_representation(self, instance):
+        return cart_data([instance], self.context.get('request'))['items'][0]
 
 
 class CartSerializer(serializers.Serializer):
-    """Сериализатор для корзины (работает со списком словарей из сессионной корзины)"""
-    items = serializers.SerializerMethodField()
-    total_price = serializers.SerializerMethodField()
-    total_quantity = serializers.SerializerMethodField()
-    
-    def get_items(self, obj):
-        """Сериализует элементы корзины"""
-        # obj - это список словарей из корзины
-        item_serializer = CartItemSerializer(obj, many=True)
-        return item_serializer.data
-    
-    def get_total_price(self, obj):
-        """Вычисляет общую стоимость корзины"""
-        # obj - это список словарей из корзины
-        # Используем float с самого начала, чтобы избежать проблем с Decimal
-        total = 0.0
-        
-        for item in obj:
-            if isinstance(item, dict):
-                # Преобразуем price сразу в float
-                price_str = item.get('price', '0')
-                try:
-                    # Если price уже Decimal, конвертируем в float
-                    if isinstance(price_str, Decimal):
-                        price = float(price_str)
-                    else:
-                        price = float(price_str)
-                except (ValueError, TypeError):
-                    price = 0.0
-                
-                quantity = item.get('quantity', 0)
-                product = item.get('product')
-                
-                if product and hasattr(product, 'discount') and product.discount:
-                    sell_price = product.sell_price()
-                    # Убеждаемся что sell_price это число (float)
-                    if isinstance(sell_price, Decimal):
-                        sell_price = float(sell_price)
-                    elif not isinstance(sell_price, (int, float)):
-                        sell_price = float(sell_price)
-                    total += sell_price * quantity
-                else:
-                    total += price * quantity
-        
-        # Возвращаем float (уже float, но для уверенности)
-        return float(total) if total else 0.0
-    
-    def get_total_quantity(self, obj):
-        """Вычисляет общее количество товаров в корзине"""
-        # obj - это список словарей из корзины
-        return sum(item.get('quantity', 0) if isinstance(item, dict) else getattr(item, 'quantity', 0) for item in obj)
+    """
+    Корзина (список словарей из Cart.__iter__): items в формате
+    CartItemSerializer, total_price и total_quantity. Собирается за один
+    проход без вложенных сериализаторов (см. api.fastpath.cart_data).
+    """
+
+    def include_item(self, product_id):
+        return True
+
+    def to_representation(self, instance):
+        return cart_data(instance, self.context.get('request'), self.include_item)
+
+
+class CartDeltaSerializer(CartSerializer):
+    """
+    Ответ на изменение корзины в режиме delta: только изменённые позиции,
+    id удалённых товаров и новые итоги. В context: changed - id товаров
+    (строки), которые затронула операция, version - новая версия корзины.
+    """
+
+    def include_item(self, product_id):
+        return str(product_id) in self.context['changed']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        present = {str(item['product'].id) for item in instance}
+        data['version'] = self.context['version']
+        data['removed'] = sorted(int(product_id) for product_id in self.context['changed']
+                                 if product_id not in present)
+        return data
+
+
+class CartOperationSerializer(serializers.Serializer):
+    """Одна операция пакетного изменения корзины"""
+    OPERATIONS = ('add', 'set', 'remove')
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False, min_value=1, max_value=10)
+
+    def validate(self, attrs):
+        """set требует quantity, add по умолчанию добавляет 1"""
+        if attrs['op'] == 'set' and 'quantity' not in attrs:
+            raise serializers.ValidationError("quantity is required for set")
+        if attrs['op'] == 'add':
+            attrs.setdefault('quantity', 1)
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    """Список операций, применяемых к корзине по порядку"""
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
 
 
 class SearchProductSerializer(serializers.ModelSerializer):
@@ -0,0 +1,90 @@
+import csv
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from .fastpath import (
+    PRODUCT_VALUES,
+    datetime_formatter,
+    image_formatter,
+    product_row_builder,
+)
+
+
+# Размер пачки для серверного курсора (iterator(chunk_size=...))
+STREAM_CHUNK_SIZE = 2000
+# Сколько строк склеивать в один кусок ответа
+LINES_PER_CHUNK = 200
+
+STREAM_FORMATS = ('ndjson', 'csv')
+
+PRODUCT_CSV_COLUMNS = (
+    'id', 'category_id', 'category_slug', 'name', 'slug', 'image',
+    'description', 'price', 'discount', 'sell_price', 'available',
+    'created', 'updated',
+)
+
+
+def product_csv_row(values, format_image, format_datetime):
+    """Плоская строка для CSV-выгрузки"""
+    return (
+        values['id'], values['category_id'], values['category__slug'],
+        values['name'], values['slug'], format_image(values['image']) or '',
+        values['description'], values['price'], values['discount'],
+        values['discounted_price'], int(values['available']),
+        format_datetime(values['created']), format_datetime(values['updated']),
+    )
+
+
+def _chunked(lines):
+    """Склеивает строки в куски, чтобы не отдавать по одной строке за раз"""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= LINES_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи"""
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows, header):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_products(queryset, stream_format, request=None, filename='products'):
+    """
+    Потоковая выдача товаров в NDJSON или CSV. Строки читаются серверным
+    курсором пачками по STREAM_CHUNK_SIZE, поэтому память не растёт
+    с размером каталога.
+    """
+    values = queryset.values(*PRODUCT_VALUES).iterator(chunk_size=STREAM_CHUNK_SIZE)
+    if stream_format == 'csv':
+        format_image = image_formatter(request)
+        format_datetime = datetime_formatter()
+        lines = _csv_lines((product_csv_row(row, format_image, format_datetime)
+                            for row in values),
+                           PRODUCT_CSV_COLUMNS)
+        content_type = 'text/csv; charset=utf-8'
+        extension = 'csv'
+    else:
+        build = product_row_builder(request)
+        lines = _ndjson_lines(build(row) for row in values)
+        content_type = 'application/x-ndjson; charset=utf-8'
+        extension = 'ndjson'
+    response = StreamingHttpResponse(_chunked(lines), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (filename, extension)
+    return response
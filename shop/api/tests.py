@@ -0,0 +1,195 @@
+import base64
+import json
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from main.models import Category, Product
+from users.models import User
+from .search_cache import search_cache
+
+
+class SearchCacheKeyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        books = Category.objects.create(name='Books', slug='books')
+        Category.objects.create(name='Books upper', slug='Books')
+        cls.product = Product.objects.create(category=books, name='Book',
+                                             slug='book', price=Decimal('10.00'))
+
+    def setUp(self):
+        search_cache.results.clear()
+
+    def search(self, query):
+        response = self.client.get('/api/v1/search/search/' + query)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['results']], response['X-Cache']
+
+    def test_boolean_spellings_filter_the_same_and_share_a_key(self):
+        self.assertEqual(self.search('?available=1'), ([self.product.id], 'MISS'))
+        self.assertEqual(self.search('?available=true'), ([self.product.id], 'HIT'))
+
+    def test_category_case_does_not_collide(self):
+        self.assertEqual(self.search('?category=Books'), ([], 'MISS'))
+        self.assertEqual(self.search('?category=books'), ([self.product.id], 'MISS'))
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books', slug='books')
+        cls.product = Product.objects.create(category=category, name='Book',
+                                             slug='book', price=Decimal('10.00'))
+
+    def test_list_is_validated_by_etag_only(self):
+        response = self.client.get('/api/v1/products/')
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+        response = self.client.get('/api/v1/products/',
+                                   HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/v1/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_hit_does_not_touch_the_database(self):
+        for url in ('/api/v1/products/', '/api/v1/products/?pagination=cursor'):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_products(self):
+        etag = self.client.get('/api/v1/products/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.product.pk).delete()
+        self.assertNotEqual(self.client.get('/api/v1/products/')['ETag'], etag)
+
+
+class CursorPaginationTests(TestCase):
+
+    def cursor(self, payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def test_malformed_cursor_is_not_found(self):
+        ordering = ['name', 'id']
+        for payload in ({'p': 5, 'o': ordering}, {'p': None, 'o': ordering},
+                        {'p': ['Book'], 'o': ordering}, [1, 2], 'p'):
+            with self.subTest(payload=payload):
+                response = self.client.get('/api/v1/products/?cursor=' + self.cursor(payload))
+                self.assertEqual(response.status_code, 404)
+
+
+class CacheStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def test_catalog_cache_counters_are_exposed_to_staff(self):
+        self.assertIn(self.client.get('/api/v1/search/stats/').status_code, (401, 403))
+        self.client.get('/api/v1/products/')
+        self.client.get('/api/v1/products/')
+        self.client.force_login(self.admin)
+        stats = self.client.get('/api/v1/search/stats/').json()['catalog_cache']
+        self.assertEqual(set(stats), {'hits', 'misses', 'waits', 'hit_ratio'})
+        self.assertGreaterEqual(stats['hits'], 1)
+
+
+class OrderCreateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books', slug='books')
+        cls.products = [Product.objects.create(category=category, name=f'Book {index}',
+                                               slug=f'book-{index}', price=Decimal('10.00'))
+                        for index in range(3)]
+
+    def test_response_is_built_from_created_items(self):
+        for product in self.products:
+            self.client.post('/api/v1/cart/add_item/', {'product_id': product.id, 'quantity': 2},
+                             content_type='application/json')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/orders/', {
+                'first_name': 'a', 'last_name': 'b', 'email': 'a@example.com',
+                'city': 'c', 'address': 'd', 'postal_code': '1',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        items = response.json()['items']
+        self.assertEqual(sorted(item['product']['id'] for item in items),
+                         [product.id for product in self.products])
+        self.assertTrue(all(item['id'] and item['cost'] == 20.0 for item in items))
+        self.assertFalse([query for query in queries
+                          if query['sql'].startswith('SELECT') and 'orders_orderitem' in query['sql']])
+
+
+class CartBatchTests(TestCase):
+    storages = ('cart.storage.SessionCartStorage', 'cart.storage.CacheCartStorage',
+                'cart.storage.DatabaseCartStorage')
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books', slug='books')
+        cls.book = Product.objects.create(category=category, name='Book',
+                                          slug='book', price=Decimal('10.00'))
+        cls.pen = Product.objects.create(category=category, name='Pen',
+                                         slug='pen', price=Decimal('2.50'))
+
+    def batch(self, *operations, **params):
+        return self.client.post('/api/v1/cart/batch/', {'operations': list(operations), **params},
+                                content_type='application/json')
+
+    def test_missing_product_leaves_cart_unchanged(self):
+        for storage in self.storages:
+            with self.subTest(storage=storage), self.settings(CART_STORAGE=storage):
+                self.client = self.client_class()
+                self.batch({'op': 'add', 'product_id': self.book.id, 'quantity': 1})
+                before = self.client.get('/api/v1/cart/').json()
+
+                response = self.batch(
+                    {'op': 'add', 'product_id': self.pen.id, 'quantity': 2},
+                    {'op': 'remove', 'product_id': self.book.id},
+                    {'op': 'add', 'product_id': 0, 'quantity': 1})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()['product_ids'], [0])
+                self.assertEqual(self.client.get('/api/v1/cart/').json(), before)
+
+    def test_delta_response(self):
+        for storage in self.storages:
+            with self.subTest(storage=storage), self.settings(CART_STORAGE=storage):
+                self.client = self.client_class()
+                self.batch({'op': 'add', 'product_id': self.book.id, 'quantity': 1},
+                           {'op': 'add', 'product_id': self.pen.id, 'quantity': 1})
+                version = self.client.get('/api/v1/cart/').json()['version']
+
+                response = self.batch(
+                    {'op': 'set', 'product_id': self.pen.id, 'quantity': 4},
+                    {'op': 'add', 'product_id': self.pen.id, 'quantity': 1},
+                    {'op': 'remove', 'product_id': self.book.id},
+                    delta=True)
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual(data['version'], version + 1)
+                self.assertEqual(data['removed'], [self.book.id])
+                self.assertEqual([(item['product_id'], item['quantity'], item['total_price'])
+                                  for item in data['items']], [(self.pen.id, 5, 12.5)])
+                self.assertEqual(data['total_price'], 12.5)
+                self.assertEqual(data['total_quantity'], 5)
+
+    def test_unchanged_cart_is_not_modified(self):
+        for storage in self.storages:
+            with self.subTest(storage=storage), self.settings(CART_STORAGE=storage):
+                self.client = self.client_class()
+                response = self.batch({'op': 'add', 'product_id': self.book.id, 'quantity': 1})
+                etag = response['ETag']
+                response = self.client.get('/api/v1/cart/', HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+                self.batch({'op': 'add', 'product_id': self.pen.id, 'quantity': 1})
+                response = self.client.get('/api/v1/cart/', HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
@@ -1,3 +1,4 @@
+import hashlib
 from django.conf import settings
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
@@ -15,31 +16,54 @@ class CsrfExemptSessionAuthentication(SessionAuthentication):
         return  # Отключить CSRF проверку
 from rest_framework.viewsets import ViewSet
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.db import transaction
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from main.cache import get_generations
 from main.models import Category, Product
+from main.autocomplete import get_index as get_autocomplete_index
+from main.search import search_facets, search_products
+from main.stats import get_category_stats
 from users.models import User
+from orders.checkout import (
+    OutOfStock,
+    create_order_items,
+    order_totals,
+    renew_reservation,
+    reservation_deadline,
+    reserve_stock,
+)
 from orders.models import Order, OrderItem
 from cart.cart import Cart
 import stripe
 from .serializers import (
     CategorySerializer,
+    CategoryStatsSerializer,
     ProductSerializer,
+    ProductBulkUpdateSerializer,
     UserSerializer,
     OrderSerializer,
     OrderItemSerializer,
     CartSerializer,
     CartItemSerializer,
+    CartBatchSerializer,
+    CartDeltaSerializer,
     UserRegistrationSerializer,
     UserLoginSerializer,
     UserProfileSerializer,
     PasswordChangeSerializer,
     SearchProductSerializer # Добавляем новый сериализатор
 )
+from .cache import CatalogCacheMixin, get_cache_stats
+from .mixins import ConditionalGetMixin, EagerLoadingMixin, eager_load
+from .fastpath import ProductFastListMixin, product_list_response
+from .pagination import HybridPagination
+from .search_cache import parse_boolean, search_cache, search_cached, search_instrumented
+from .streaming import STREAM_FORMATS, stream_products
 
-from django.db.models import Q # Добавляем Q для сложных запросов
 
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
@@ -51,7 +75,8 @@ class CsrfExemptSessionAuthentication(SessionAuthentication):
         return  # Отключить CSRF проверку
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, CatalogCacheMixin, EagerLoadingMixin,
+                      viewsets.ModelViewSet):
     """
     ViewSet для модели Category.
     Предоставляет стандартные операции: list, create, retrieve, update, destroy.
@@ -60,9 +85,27 @@ class CategoryViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
-
-
-class ProductViewSet(viewsets.ModelViewSet):
+    # Статистика зависит от товаров, поэтому кэш сбрасывается и по Product
+    catalog_cache_models = (Category, Product)
+    # У Category нет поля updated - изменения отслеживаются поколениями моделей
+    conditional_timestamp_fields = ()
+    conditional_generation_models = (Category, Product)
+
+    def get_serializer_class(self):
+        """Для чтения отдаём категории вместе с количеством товаров и ценами"""
+        if self.action in ('list', 'retrieve'):
+            return CategoryStatsSerializer
+        return CategorySerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'retrieve'):
+            context['category_stats'] = get_category_stats()
+        return context
+
+
+class ProductViewSet(ConditionalGetMixin, CatalogCacheMixin, EagerLoadingMixin,
+                     ProductFastListMixin, viewsets.ModelViewSet):
     """
     ViewSet для модели Product.
     Предоставляет стандартные операции: list, create, retrieve, update, destroy.
@@ -72,8 +115,11 @@ class ProductViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
     search_fields = ['name', 'description']
-    ordering_fields = ['name', 'price', 'created']
+    ordering_fields = ['name', 'price', 'discounted_price', 'created']
     ordering = ['name']
+    pagination_class = HybridPagination
+    catalog_cache_models = (Product, Category)
+    conditional_generation_models = (Product, Category)
     
     def get_queryset(self):
         """Фильтрация по доступности продуктов"""
@@ -86,13 +132,74 @@ class ProductViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def available(self, request):
-        """Дополнительный endpoint для получения только доступных продуктов"""
-        available_products = self.queryset.filter(available=True)
+        """
+        Дополнительный endpoint для получения только доступных продуктов.
+        ?stream=ndjson|csv - потоковая выдача без загрузки всего каталога в память.
+        """
+        stream_format = request.query_params.get('stream')
+        if stream_format:
+            if stream_format not in STREAM_FORMATS:
+                return Response(
+                    {'error': 'stream must be one of: %s' % ', '.join(STREAM_FORMATS)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            queryset = Product.objects.filter(available=True).order_by('id')
+            return stream_products(queryset, stream_format, request,
+                                   filename='products-available')
+
+        available_products = self.setup_eager_loading(
+            self.queryset.filter(available=True))
         serializer = self.get_serializer(available_products, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """Потоковая выгрузка всего каталога для персонала (?stream=ndjson|csv)"""
+        stream_format = request.query_params.get('stream', 'ndjson')
+        if stream_format not in STREAM_FORMATS:
+            return Response(
+                {'error': 'stream must be one of: %s' % ', '.join(STREAM_FORMATS)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = Product.objects.order_by('id')
+        return stream_products(queryset, stream_format, request,
+                               filename='products-export')
 
-class UserViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk_update(self, request):
+        """
+        Массовое изменение цены/скидки/доступности для персонала.
+        Фильтры: category (slug), ids, name (подстрока) или all=true.
+        Изменения: price или price_percent, discount, available.
+        dry_run=true возвращает только количество затронутых товаров.
+        """
+        serializer = ProductBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = Product.objects.all()
+        if 'category' in data:
+            queryset = queryset.filter(category__slug=data['category'])
+        if 'ids' in data:
+            queryset = queryset.filter(id__in=data['ids'])
+        if 'name' in data:
+            queryset = queryset.filter(name__icontains=data['name'])
+
+        if data['dry_run']:
+            return Response({'dry_run': True, 'matched': queryset.count()})
+
+        # Один UPDATE; кэш каталога сбрасывается один раз после коммита
+        with transaction.atomic():
+            updated = queryset.apply_pricing(
+                price=data.get('price'),
+                price_percent=data.get('price_percent'),
+                discount=data.get('discount'),
+                available=data.get('available'),
+            )
+        return Response({'dry_run': False, 'updated': updated})
+
+
+class UserViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet для модели User.
     Предоставляет стандартные операции: list, create, retrieve, update, destroy.
@@ -120,14 +227,18 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet для модели Order.
     Предоставляет стандартные операции: list, create, retrieve, update, destroy.
     """
     serializer_class = OrderSerializer
-    ordering_fields = ['created', 'paid']
+    ordering_fields = ['created', 'paid', 'total_cost', 'item_count']
     ordering = ['-created']
+    pagination_class = HybridPagination
+    # В заказ вложены данные товаров, поэтому учитываем и поколения каталога
+    conditional_generation_models = (Product, Category)
+    conditional_private = True
     
     def get_permissions(self):
         """Разрешает создание заказов анонимным пользователям, но требует аутентификацию для просмотра"""
@@ -174,9 +285,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         создает Order и OrderItem для каждого товара в корзине, затем очищает корзину.
         """
         cart = Cart(request)
+        # Товары загружаются один раз - их цены нужны для позиций заказа
+        cart_items = list(cart)
         
         # Проверяем что корзина не пуста
-        if len(cart) == 0:
+        if not cart_items:
             return Response(
                 {'error': 'Cart is empty'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -186,36 +299,29 @@ class OrderViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Создаем заказ
+        # Списание остатка, заказ, все позиции (один INSERT) и очистка
+        # корзины - одна транзакция: при нехватке товара не меняется ничего
         user = request.user if request.user.is_authenticated else None
-        order = serializer.save(user=user)
-        
-        # Создаем OrderItem для каждого товара в корзине
-        for item in cart:
-            product = item['product']
-            quantity = item['quantity']
-            
-            # Используем цену со скидкой, если она есть
-            if product.discount:
-                price = product.sell_price()
-            else:
-                price = product.price
-            
-            # Создаем OrderItem
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                price=price,
-                quantity=quantity
+        try:
+            with transaction.atomic():
+                reserved = reserve_stock(cart_items)
+                order = serializer.save(
+                    user=user,
+                    reserved_until=reservation_deadline() if reserved else None,
+                    **order_totals(cart_items))
+                items = create_order_items(order, cart_items)
+                cart.clear()
+        except OutOfStock as e:
+            return Response(
+                {'error': 'Not enough stock', 'product_ids': e.product_ids},
+                status=status.HTTP_409_CONFLICT
             )
         
-        # Очищаем корзину после создания заказа
-        cart.clear()
-        
-        # Возвращаем созданный заказ с полной информацией
-        headers = self.get_success_headers(serializer.data)
+        # Позиции только что созданы и товары при них уже загружены из корзины
+        data = OrderSerializer(order, context={'order_items': items}).data
+        headers = self.get_success_headers(data)
         return Response(
-            OrderSerializer(order).data,
+            data,
             status=status.HTTP_201_CREATED,
             headers=headers
         )
@@ -232,8 +338,19 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Обновляем статус
+        # Резерв уже снят - без остатка на складе оплатить нельзя
+        if not order.paid:
+            try:
+                renew_reservation(order)
+            except OutOfStock as e:
+                return Response(
+                    {'error': 'Not enough stock', 'product_ids': e.product_ids},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+        # Обновляем статус (списанный остаток остаётся за заказом)
         order.paid = True
+        order.reserved_until = None
         order.save()
 
         return Response({
@@ -243,7 +360,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         })
 
 
-class OrderItemViewSet(viewsets.ModelViewSet):
+class OrderItemViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet для модели OrderItem.
     Предоставляет стандартные операции: list, create, retrieve, update, destroy.
@@ -258,29 +375,65 @@ class OrderItemViewSet(viewsets.ModelViewSet):
 class CartViewSet(ViewSet):
     """
     ViewSet для работы с корзиной покупок.
-    Корзина хранится в сессии Django (сессионная корзина, не модель БД).
-    Работает со словарями из сессии, а не с моделями.
+    Корзина хранится в хранилище из settings.CART_STORAGE (по умолчанию в сессии).
+    Работает со словарями позиций, а не с моделями.
+    Каждое изменение увеличивает версию корзины; изменения с delta=true
+    возвращают только затронутые позиции и итоги, GET отдаёт ETag.
     """
     authentication_classes = [CsrfExemptSessionAuthentication]
     permission_classes = [permissions.AllowAny]
-    
+
+    def get_etag(self, cart):
+        """
+        ETag корзины: её владелец и версия плюс поколения каталога
+        (цены и названия товаров в ответе могут измениться и без корзины)
+        """
+        raw = repr((cart.storage.identity(), cart.version, get_generations(Product, Category)))
+        return 'W/"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+    def wants_delta(self, request):
+        """Режим delta: ?delta=true или "delta": true в теле запроса"""
+        data = request.data if isinstance(request.data, dict) else {}
+        value = request.query_params.get('delta', data.get('delta', False))
+        if isinstance(value, str):
+            return value.lower() in ('true', '1', 'yes')
+        return bool(value)
+
+    def cart_response(self, request, cart, changed=None, status_code=status.HTTP_200_OK):
+        """
+        Полная корзина (с version) или, если изменение запрошено в режиме
+        delta, только затронутые позиции changed и новые итоги.
+        """
+        cart_items = list(cart)
+        if changed is not None and self.wants_delta(request):
+            data = CartDeltaSerializer(
+                cart_items, context={'changed': changed, 'version': cart.version}).data
+        else:
+            data = CartSerializer(cart_items).data
+            data['version'] = cart.version
+        response = Response(data, status=status_code)
+        response['ETag'] = self.get_etag(cart)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
     def list(self, request):
-        """Получить текущую корзину пользователя (GET /api/v1/cart/)"""
+        """
+        Получить текущую корзину пользователя (GET /api/v1/cart/).
+        Поддерживает If-None-Match: если корзина и каталог не менялись - 304
+        без запросов к товарам.
+        """
         cart = Cart(request)
-        # Получаем список словарей из сессионной корзины
-        cart_items = list(cart)
-        # Передаем список словарей в сериализатор
-        serializer = CartSerializer(cart_items)
-        return Response(serializer.data)
+        etag = self.get_etag(cart)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return self.cart_response(request, cart)
     
     def retrieve(self, request, pk=None):
         """Получить текущую корзину пользователя (GET /api/v1/cart/{pk}/)"""
-        cart = Cart(request)
-        # Получаем список словарей из сессионной корзины
-        cart_items = list(cart)
-        # Передаем список словарей в сериализатор
-        serializer = CartSerializer(cart_items)
-        return Response(serializer.data)
+        return self.list(request)
     
     @action(detail=False, methods=['post'])
     def add_item(self, request):
@@ -303,13 +456,17 @@ class CartViewSet(ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        if not product.in_stock:
+            return Response(
+                {'error': 'Product is out of stock'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
         cart = Cart(request)
         cart.add(product=product, quantity=quantity, override_quantity=override_quantity)
         
-        # Возвращаем обновленную корзину (список словарей из сессии)
-        cart_items = list(cart)
-        serializer = CartSerializer(cart_items)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Возвращаем обновленную корзину (или только изменённую позицию в режиме delta)
+        return self.cart_response(request, cart, changed={str(product.id)})
     
     @action(detail=False, methods=['post'])
     def update_quantity(self, request):
@@ -340,10 +497,8 @@ class CartViewSet(ViewSet):
         cart = Cart(request)
         cart.add(product=product, quantity=quantity, override_quantity=True)
         
-        # Возвращаем обновленную корзину (список словарей из сессии)
-        cart_items = list(cart)
-        serializer = CartSerializer(cart_items)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Возвращаем обновленную корзину (или только изменённую позицию в режиме delta)
+        return self.cart_response(request, cart, changed={str(product.id)})
     
     @action(detail=False, methods=['post'])
     def remove_item(self, request):
@@ -367,11 +522,55 @@ class CartViewSet(ViewSet):
         cart = Cart(request)
         cart.remove(product)
         
-        # Возвращаем обновленную корзину (список словарей из сессии)
-        cart_items = list(cart)
-        serializer = CartSerializer(cart_items)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Возвращаем обновленную корзину (или только изменённую позицию в режиме delta)
+        return self.cart_response(request, cart, changed={str(product.id)})
     
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Применить список операций по порядку (POST /api/v1/cart/batch/):
+        {"operations": [{"op": "add" | "set" | "remove", "product_id": 1, "quantity": 2}, ...]}
+        Все товары загружаются одним запросом, корзина сериализуется один раз.
+        Если хотя бы один товар не найден (или недоступен для add/set),
+        корзина не меняется.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['operations']
+
+        product_ids = {operation['product_id'] for operation in operations}
+        products = Product.objects.in_bulk(product_ids)
+
+        def unavailable(operation):
+            product = products.get(operation['product_id'])
+            if product is None:
+                return True
+            # Добавлять можно только доступные товары, которые есть на складе
+            return operation['op'] != 'remove' and not (product.available and product.in_stock)
+
+        missing = sorted(operation['product_id'] for operation in operations
+                         if unavailable(operation))
+        if missing:
+            return Response(
+                {'error': 'Product not found or not available', 'product_ids': missing},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        cart = Cart(request)
+        # Вся пачка - одно изменение: version растёт на 1, и клиент
+        # применяет delta к своей корзине без повторной загрузки
+        with cart.storage.batch():
+            for operation in operations:
+                product = products[operation['product_id']]
+                if operation['op'] == 'remove':
+                    cart.remove(product)
+                else:
+                    cart.add(product=product, quantity=operation['quantity'],
+                             override_quantity=operation['op'] == 'set')
+
+        return self.cart_response(request, cart,
+                                  changed={str(product_id) for product_id in product_ids})
+
     @action(detail=False, methods=['get'])
     def get_quantity(self, request):
         """Получить общее количество товаров в корзине"""
@@ -382,37 +581,79 @@ class CartViewSet(ViewSet):
     def clear(self, request):
         """Очистить корзину"""
         cart = Cart(request)
+        changed = set(cart.cart)
         cart.clear()
-        return Response({'message': 'Cart cleared'}, status=status.HTTP_200_OK)
+        if self.wants_delta(request):
+            return self.cart_response(request, cart, changed=changed)
+        return Response({'message': 'Cart cleared', 'version': cart.version},
+                        status=status.HTTP_200_OK)
 
 
-class SearchViewSet(viewsets.ViewSet):
+class SearchViewSet(EagerLoadingMixin, viewsets.GenericViewSet):
     """
     ViewSet для поиска продуктов.
     Предоставляет эндпоинты: search (полный поиск) и autocomplete (быстрые подсказки).
     """
     permission_classes = [AllowAny]
+    serializer_class = ProductSerializer
+    ordering_fields = ['name', 'price', 'discounted_price', 'created']
+    ordering = ['name']
+    pagination_class = HybridPagination
 
     def get_queryset(self):
         """Базовый queryset для продуктов, который может быть расширен фильтрами"""
         return Product.objects.filter(available=True)
 
+    def get_price_bounds(self, request):
+        """Границы ценовых интервалов для фасетов: ?price_buckets=100,500,1000"""
+        value = request.query_params.get('price_buckets')
+        if not value:
+            return settings.SEARCH_PRICE_BUCKETS
+        try:
+            bounds = sorted({Decimal(bound) for bound in value.split(',') if bound.strip()})
+            if not all(bound.is_finite() for bound in bounds):
+                raise InvalidOperation
+        except InvalidOperation:
+            raise ValidationError('price_buckets must be a comma-separated list of numbers')
+        if not bounds or len(bounds) > settings.SEARCH_MAX_PRICE_BUCKETS:
+            raise ValidationError(
+                f'price_buckets must contain 1 to {settings.SEARCH_MAX_PRICE_BUCKETS} numbers')
+        return bounds
+
     @action(detail=False, methods=['get'])
+    @search_instrumented
+    @search_cached
     def search(self, request):
-        """Полный поиск продуктов с фильтрами по имени, описанию, категории, цене и доступности."""
-        queryset = self.get_queryset()
+        """
+        Полный поиск продуктов с фильтрами по имени, описанию, категории, цене и доступности.
+        Текст ищется полнотекстовым поиском (main.search) с сортировкой по
+        релевантности, если не задан параметр ordering.
+        Фильтр по цене работает по цене со скидкой (discounted_price).
+        ?facets=true добавляет в ответ количество найденных товаров по категориям
+        и ценовым интервалам (?price_buckets=...).
+        Ответ кэшируется в памяти процесса по нормализованному ключу (api.search_cache).
+        """
+        # Параметры читаются по тем же правилам, что и ключ кэша (api.search_cache)
+        facets = parse_boolean(request.query_params.get('facets', ''))
+        if facets:
+            try:
+                price_bounds = self.get_price_bounds(request)
+            except ValidationError as e:
+                return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())
         query = request.query_params.get('q', None)
-        category_slug = request.query_params.get('category', None)
+        category_slug = request.query_params.get('category', '').strip()
         min_price = request.query_params.get('min_price', None)
         max_price = request.query_params.get('max_price', None)
         available = request.query_params.get('available', None)
 
         if query:
-            queryset = queryset.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(category__name__icontains=query)
-            )
+            # Так же нормализован ключ кэша (регистр учитывает сам поиск)
+            query = ' '.join(query.split())
+            queryset, ranked = search_products(queryset, query)
+            # Без явного ordering - сначала самые релевантные
+            if ranked and not request.query_params.get('ordering'):
+                queryset = queryset.order_by('-rank', 'id')
 
         if category_slug:
             queryset = queryset.filter(category__slug=category_slug)
@@ -420,39 +661,59 @@ class SearchViewSet(viewsets.ViewSet):
         if min_price:
             try:
                 min_price = float(min_price)
-                queryset = queryset.filter(price__gte=min_price)
+                queryset = queryset.filter(discounted_price__gte=min_price)
             except ValueError:
                 return Response({'error': 'min_price must be a valid number'}, status=status.HTTP_400_BAD_REQUEST)
 
         if max_price:
             try:
                 max_price = float(max_price)
-                queryset = queryset.filter(price__lte=max_price)
+                queryset = queryset.filter(discounted_price__lte=max_price)
             except ValueError:
                 return Response({'error': 'max_price must be a valid number'}, status=status.HTTP_400_BAD_REQUEST)
 
         if available is not None:
-            available_bool = available.lower() == 'true'
-            queryset = queryset.filter(available=available_bool)
+            queryset = queryset.filter(available=parse_boolean(available))
         
-        # Применяем пагинацию, если она нужна
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = ProductSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = ProductSerializer(queryset, many=True)
-        return Response(serializer.data)
+        # Список собирается без ProductSerializer (тот же JSON, см. api/fastpath.py)
+        response = product_list_response(self, queryset)
+        if facets:
+            response.data['facets'] = search_facets(queryset, price_bounds)
+        return response
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def stats(self, request):
+        """
+        Статистика кэшей текущего процесса: поиска (hit ratio, популярные
+        запросы) и, в catalog_cache, ответов каталога (попадания, промахи, ожидания)
+        """
+        try:
+            top = min(int(request.query_params.get('top', 20)), 100)
+        except ValueError:
+            return Response({'error': 'top must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        stats = search_cache.stats(top=top)
+        stats['catalog_cache'] = get_cache_stats()
+        return Response(stats)
 
     @action(detail=False, methods=['get'])
     def autocomplete(self, request):
-        """Возвращает id, name, slug для быстрого автодополнения поиска по имени продукта."""
+        """
+        Возвращает id, name, slug для быстрого автодополнения поиска по имени продукта.
+        Отвечает индекс в памяти (main.autocomplete), без запросов к БД.
+        """
         query = request.query_params.get('q', None)
-        if query:
-            queryset = Product.objects.filter(name__icontains=query, available=True)[:10] # Ограничиваем до 10 подсказок
-            serializer = SearchProductSerializer(queryset, many=True)
-            return Response(serializer.data)
-        return Response([])
+        if not query:
+            return Response([])
+        index = get_autocomplete_index()
+        if index.complete:
+            return Response([
+                {'id': product_id, 'name': name, 'slug': slug}
+                for product_id, name, slug in index.search(query, limit=10)
+            ])
+        # Каталог больше лимита индекса - ищем в БД
+        queryset = Product.objects.filter(name__icontains=query, available=True)[:10] # Ограничиваем до 10 подсказок
+        serializer = SearchProductSerializer(queryset, many=True)
+        return Response(serializer.data)
 
 
 class AuthViewSet(ViewSet):
@@ -616,6 +877,15 @@ class PaymentViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Резерв истёк и остаток вернулся на склад - списываем заново
+        try:
+            renew_reservation(order)
+        except OutOfStock as e:
+            return Response(
+                {'error': 'Not enough stock', 'product_ids': e.product_ids},
+                status=status.HTTP_409_CONFLICT
+            )
+
         # Создаем success и cancel URLs - редирект на React (localhost:3000)
         success_url = f'http://localhost:3000/orders/{order.id}?paid=true'
         cancel_url = f'http://localhost:3000/orders/{order.id}?canceled=true'
@@ -649,7 +919,7 @@ class PaymentViewSet(viewsets.ViewSet):
                 print(f"   - {item.product.name}: ${discounted_price} x {item.quantity}")
                 session_data['line_items'].append({
                     'price_data': {
-                        'unit_amount': int(discounted_price * Decimal('100')),
+                        'unit_amount': discounted_price.cents,
                         'currency': 'usd',
                         'product_data': {
                             'name': item.product.name,
@@ -700,8 +970,20 @@ class PaymentViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        # Резерв уже снят - без остатка на складе оплатить нельзя
+        if not order.paid:
+            try:
+                renew_reservation(order)
+            except OutOfStock as e:
+                return Response(
+                    {'error': 'Not enough stock', 'product_ids': e.product_ids},
+                    status=status.HTTP_409_CONFLICT
+                )
+
         order.paid = True
+        order.reserved_until = None
         order.save()
+        eager_load([order], OrderSerializer)
 
         return Response({
             'message': 'Order marked as paid',
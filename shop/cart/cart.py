@@ -1,43 +1,44 @@
-from decimal import Decimal
-from django.conf import settings
 from main.models import Product
+from main.money import Money, money_sum
+from .storage import get_cart_storage
 
 
 class Cart:
     def __init__(self, request):
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        # Где лежат позиции, задаёт settings.CART_STORAGE (см. cart/storage.py)
+        self.storage = get_cart_storage(request)
+        self.cart = self.storage.load()
+
+
+    @property
+    def version(self):
+        """Номер версии корзины, растёт при каждом изменении"""
+        return self.storage.version
 
 
     def add(self, product, quantity=1, override_quantity=False):
         product_id = str(product.id)
-        if product_id not in self.cart:
-            self.cart[product_id] = {'quantity': 0,
-                                     'price': str(product.price)}
-        if override_quantity:
-            self.cart[product_id]['quantity'] = quantity
-        else:
-            self.cart[product_id]['quantity'] += quantity
-        self.save()
+        self.cart[product_id] = self.storage.add(product_id, quantity,
+                                                 str(product.price),
+                                                 override_quantity)
 
 
     def save(self):
-        self.session.modified = True
+        self.storage.save()
 
 
     def remove(self, product):
         product_id = str(product.id)
         if product_id in self.cart:
-            del self.cart[product_id]
-            self.save()
+            self.storage.remove(product_id)
+            self.cart.pop(product_id, None)
 
 
     def __iter__(self):
         product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids, available=True)
+        # Категория нужна в ответе корзины - загружаем её тем же запросом
+        products = Product.objects.filter(id__in=product_ids, available=True) \
+                                  .select_related('category')
         product_dict = {str(product.id): product for product in products}
         
         for product_id, item in self.cart.items():
@@ -46,13 +47,8 @@ class Cart:
             
             if product:
                 item['product'] = product
-                # Оставляем price как строку (как в сессии) для сериализации
-                # Конвертируем только для вычисления total_price
-                price_str = item.get('price', '0')
-                price_decimal = Decimal(price_str)
-                # Оставляем price как строку, чтобы избежать проблем с Decimal в сериализации
-                item['price'] = price_str  # Строка для сериализации
-                item['total_price'] = float(price_decimal * item['quantity'])  # float для сериализации
+                # price остаётся строкой, как в хранилище; суммы - в Money
+                item['total_price'] = Money.from_decimal(item.get('price', '0')) * item['quantity']
                 yield item
 
         
@@ -61,11 +57,18 @@ class Cart:
     
 
     def clear(self):
-        del self.session[settings.CART_SESSION_ID]
+        self.storage.clear()
+        self.cart = {}
 
 
     def get_total_price(self):
-        total = sum((Decimal(item['price']) - (Decimal(item['price']) \
-                    *  Decimal(item['product'].discount / 100))) * item['quantity']
-                        for item in self.cart.values())
-        return format(total, '.2f')
\ No newline at end of file
+        """Итог корзины (Money): товары со скидкой - по текущей цене со скидкой"""
+        return money_sum(line_total(item) for item in self)
+
+
+def line_total(item):
+    """Стоимость позиции из Cart.__iter__ с учётом скидки товара"""
+    product = item['product']
+    if product.discount:
+        return product.sell_price() * item['quantity']
+    return item['total_price']
\ No newline at end of file
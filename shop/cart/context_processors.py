@@ -1,5 +1,7 @@
+from django.utils.functional import SimpleLazyObject
 from .cart import Cart
 
 
 def cart(request):
-    return {'cart': Cart(request)}
\ No newline at end of file
+    # Корзина создаётся (сессия и запрос товаров) только если шаблон её использует
+    return {'cart': SimpleLazyObject(lambda: Cart(request))}
@@ -0,0 +1,44 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from cart.models import CartState
+
+
+class Command(BaseCommand):
+    help = ('Удаляет корзины DatabaseCartStorage, которые не менялись дольше '
+            'заданного срока (запускать по cron, как clearsessions)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=float,
+            default=settings.CART_CACHE_TIMEOUT / 86400,
+            help='Сколько дней хранить неизменную корзину '
+                 '(по умолчанию - как корзину в кэше, CART_CACHE_TIMEOUT)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько корзин удалять за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0 or options['batch_size'] < 1:
+            raise CommandError('--days and --batch-size must be positive')
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        expired = CartState.objects.filter(updated__lt=cutoff)
+        deleted = 0
+        # Пачками, чтобы не держать долгую блокировку на большой таблице
+        while True:
+            ids = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            # Позиции удаляются каскадом вместе с корзинами
+            CartState.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+        if deleted:
+            self.stdout.write(self.style.SUCCESS(f'Удалено корзин: {deleted}'))
+        else:
+            self.stdout.write('Устаревших корзин нет')
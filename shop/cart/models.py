@@ -1,3 +1,40 @@
 from django.db import models
+from main.models import Product
 
-# Create your models here.
+
+class CartState(models.Model):
+    """Корзина для хранилища DatabaseCartStorage (ключ - из сессии)"""
+    key = models.CharField(max_length=64,
+                           unique=True)
+    version = models.PositiveIntegerField(default=0)
+    # Время последнего изменения: по нему clear_carts удаляет брошенные корзины
+    updated = models.DateTimeField(auto_now=True,
+                                   db_index=True)
+
+
+    def __str__(self):
+        return self.key
+
+
+class CartLine(models.Model):
+    """Позиция корзины: одна строка на товар, меняется отдельно от остальных"""
+    cart = models.ForeignKey(CartState,
+                             related_name='lines',
+                             on_delete=models.CASCADE)
+    product = models.ForeignKey(Product,
+                                related_name='+',
+                                on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    price = models.DecimalField(max_digits=10,
+                                decimal_places=2)
+
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'],
+                                    name='unique_cart_line'),
+        ]
+
+
+    def __str__(self):
+        return f'{self.cart_id}: {self.product_id} x {self.quantity}'
@@ -0,0 +1,340 @@
+import copy
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils.module_loading import import_string
+from .models import CartLine, CartState
+
+
+class BaseCartStorage(ABC):
+    """
+    Хранилище позиций корзины. Позиция - {'quantity': int, 'price': str}
+    по ключу str(product_id), как в сессионной корзине. Каждая операция
+    меняет одну позицию и увеличивает version корзины; внутри batch()
+    version увеличивается один раз на все операции.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.version = 0
+        self.batching = False
+        self.batch_changed = False
+
+    @contextmanager
+    def batch(self):
+        """
+        Несколько операций как одно изменение: version растёт один раз
+        в конце блока (клиент применяет delta только к version + 1)
+        """
+        if self.batching:
+            yield
+            return
+        self.batching, self.batch_changed = True, False
+        try:
+            with self.batch_scope():
+                yield
+                if self.batch_changed:
+                    self._bump()
+        finally:
+            self.batching = False
+
+    def batch_scope(self):
+        """Контекст вокруг операций batch() (замок, транзакция)"""
+        return nullcontext()
+
+    def changed(self):
+        """Операция изменила корзину: version растёт сейчас или в конце batch()"""
+        if self.batching:
+            self.batch_changed = True
+        else:
+            self._bump()
+
+    @abstractmethod
+    def _bump(self):
+        """Увеличивает version корзины"""
+
+    @abstractmethod
+    def identity(self):
+        """Чья это корзина (для ETag): разные корзины с одной версией не совпадут"""
+
+    @abstractmethod
+    def load(self):
+        """Все позиции корзины: {product_id: {'quantity': ..., 'price': ...}}"""
+
+    @abstractmethod
+    def add(self, product_id, quantity, price, override_quantity=False):
+        """Добавляет количество (или задаёт его). Возвращает новую позицию"""
+
+    @abstractmethod
+    def remove(self, product_id):
+        """Удаляет позицию (если она есть)"""
+
+    @abstractmethod
+    def clear(self):
+        """Удаляет все позиции"""
+
+    def save(self):
+        pass
+
+
+class SessionCartStorage(BaseCartStorage):
+    """Вся корзина - словарь в сессии (сохраняется вместе с сессией)"""
+    version_key = settings.CART_SESSION_ID + '_version'
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.session = request.session
+
+    def identity(self):
+        # Новая сессия получает ключ только при сохранении в конце запроса -
+        # без него ETag первого ответа не совпал бы со следующим GET
+        if self.session.session_key is None and self.session.modified:
+            self.session.save()
+        return self.session.session_key or ''
+
+    def load(self):
+        self.version = self.session.get(self.version_key, 0)
+        return self.session.get(settings.CART_SESSION_ID) or {}
+
+    @contextmanager
+    def batch_scope(self):
+        # Ошибка посреди пачки возвращает корзину в сессии к исходной
+        saved = copy.deepcopy(self.session.get(settings.CART_SESSION_ID))
+        try:
+            yield
+        except BaseException:
+            if saved is None:
+                self.session.pop(settings.CART_SESSION_ID, None)
+            else:
+                self.session[settings.CART_SESSION_ID] = saved
+            raise
+
+    def _cart(self):
+        cart = self.session.get(settings.CART_SESSION_ID)
+        if not cart:
+            cart = self.session[settings.CART_SESSION_ID] = {}
+        return cart
+
+    def _bump(self):
+        self.version = self.session[self.version_key] = self.session.get(self.version_key, 0) + 1
+        self.save()
+
+    def add(self, product_id, quantity, price, override_quantity=False):
+        cart = self._cart()
+        line = cart.setdefault(product_id, {'quantity': 0, 'price': price})
+        if override_quantity:
+            line['quantity'] = quantity
+        else:
+            line['quantity'] += quantity
+        self.changed()
+        return dict(line)
+
+    def remove(self, product_id):
+        cart = self._cart()
+        if product_id in cart:
+            del cart[product_id]
+            self.changed()
+
+    def clear(self):
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.changed()
+
+    def save(self):
+        self.session.modified = True
+
+
+class KeyedCartStorage(BaseCartStorage):
+    """
+    Корзина вне сессии. В сессии хранится только её ключ - он записывается
+    один раз и сохраняется при входе пользователя (cycle_key переносит данные).
+    """
+    key_session_id = settings.CART_SESSION_ID + '_key'
+
+    def get_key(self, create=False):
+        session = self.request.session
+        key = session.get(self.key_session_id)
+        if key is None and create:
+            key = session[self.key_session_id] = uuid.uuid4().hex
+        return key
+
+    def identity(self):
+        return self.get_key() or ''
+
+
+class CacheCartStorage(KeyedCartStorage):
+    """
+    Корзина в кэше Django: {'version': n, 'lines': {...}} под ключом
+    cart:<key>. Изменения выполняются под коротким замком (cache.add),
+    поэтому одновременные запросы из разных вкладок не затирают друг друга.
+    """
+    lock_timeout = 5
+    lock_wait = 2.0
+    lock_poll_interval = 0.02
+    data = None
+
+    def cache_key(self, key):
+        return 'cart:%s' % key
+
+    def load(self):
+        key = self.get_key()
+        if key is None:
+            return {}
+        data = cache.get(self.cache_key(key)) or {'version': 0, 'lines': {}}
+        self.version = data['version']
+        return data['lines']
+
+    @contextmanager
+    def locked(self):
+        """Данные корзины под замком: {'version': n, 'lines': {...}} (также в self.data)"""
+        key = self.cache_key(self.get_key(create=True))
+        lock_key = key + ':lock'
+        deadline = time.monotonic() + self.lock_wait
+        while not cache.add(lock_key, 1, timeout=self.lock_timeout):
+            if time.monotonic() > deadline:
+                # Замок, видимо, брошен упавшим процессом
+                break
+            time.sleep(self.lock_poll_interval)
+        try:
+            data = cache.get(key)
+            if data is None:
+                # Как поколения в main/cache.py: версия стартует с текущего
+                # времени, чтобы после вытеснения из кэша ETag'и старой
+                # корзины с той же версией не совпали с новыми
+                data = {'version': int(time.time() * 1000), 'lines': {}}
+            self.data = data
+            yield data
+        finally:
+            self.data = None
+            cache.delete(lock_key)
+
+    def _bump(self):
+        # Вызывается под замком: запись в кэш - вместе с новой версией
+        self.data['version'] += 1
+        cache.set(self.cache_key(self.get_key()), self.data, settings.CART_CACHE_TIMEOUT)
+        self.version = self.data['version']
+
+    def batch_scope(self):
+        # Один замок и одно чтение/запись кэша на все операции
+        return self.locked()
+
+    def _update(self, change):
+        if self.batching:
+            self.batch_changed = True
+            return change(self.data['lines'])
+        with self.locked() as data:
+            result = change(data['lines'])
+            self._bump()
+            return result
+
+    def add(self, product_id, quantity, price, override_quantity=False):
+        def change(lines):
+            line = lines.setdefault(product_id, {'quantity': 0, 'price': price})
+            line['quantity'] = quantity if override_quantity else line['quantity'] + quantity
+            return dict(line)
+        return self._update(change)
+
+    def remove(self, product_id):
+        self._update(lambda lines: lines.pop(product_id, None))
+
+    def clear(self):
+        self._update(lambda lines: lines.clear())
+
+
+class DatabaseCartStorage(KeyedCartStorage):
+    """
+    Корзина в таблицах CartState/CartLine. Каждая операция - UPDATE или
+    INSERT одной строки CartLine и UPDATE version, без перезаписи сессии.
+    Количество увеличивается в БД (quantity = quantity + n), поэтому
+    одновременные добавления складываются. batch() - одна транзакция.
+    Корзины истёкших сессий удаляет команда clear_carts (по cron).
+    """
+    state = None
+
+    def get_state(self, create=False):
+        """CartState корзины; найденная строка запоминается до конца запроса"""
+        if self.state is not None:
+            return self.state
+        key = self.get_key(create=create)
+        if key is None:
+            return None
+        if create:
+            self.state = CartState.objects.get_or_create(key=key)[0]
+        else:
+            self.state = CartState.objects.filter(key=key).first()
+        return self.state
+
+    def batch_scope(self):
+        # Все операции пачки применяются целиком или не применяются вовсе
+        return transaction.atomic()
+
+    def load(self):
+        state = self.get_state()
+        if state is None:
+            return {}
+        self.version = state.version
+        return {
+            str(product_id): {'quantity': quantity, 'price': str(price)}
+            for product_id, quantity, price in
+            state.lines.values_list('product_id', 'quantity', 'price')
+        }
+
+    def _bump(self):
+        # Обычно версия из load() ещё актуальна: один условный UPDATE.
+        # updated ставится явно - update() не обновляет auto_now, а по нему
+        # команда clear_carts удаляет брошенные корзины
+        state = self.get_state()
+        states = CartState.objects.filter(pk=state.pk)
+        if states.filter(version=state.version).update(version=state.version + 1,
+                                                       updated=Now()):
+            state.version += 1
+        else:
+            # Корзину только что изменил параллельный запрос
+            states.update(version=F('version') + 1, updated=Now())
+            state.version = states.values_list('version', flat=True).get()
+        self.version = state.version
+
+    def add(self, product_id, quantity, price, override_quantity=False):
+        state = self.get_state(create=True)
+        lines = CartLine.objects.filter(cart=state, product_id=product_id)
+        new_quantity = quantity if override_quantity else F('quantity') + quantity
+        # Внутри batch() транзакция уже открыта - без лишней точки сохранения
+        with transaction.atomic(savepoint=False):
+            if not lines.update(quantity=new_quantity):
+                try:
+                    with transaction.atomic():
+                        CartLine.objects.create(cart=state, product_id=product_id,
+                                                quantity=quantity, price=Decimal(price))
+                except IntegrityError:
+                    # Позицию только что создал параллельный запрос
+                    lines.update(quantity=new_quantity)
+            self.changed()
+            line = lines.values('quantity', 'price').get()
+        return {'quantity': line['quantity'], 'price': str(line['price'])}
+
+    def remove(self, product_id):
+        state = self.get_state()
+        if state is None:
+            return
+        with transaction.atomic(savepoint=False):
+            if CartLine.objects.filter(cart=state, product_id=product_id).delete()[0]:
+                self.changed()
+
+    def clear(self):
+        state = self.get_state()
+        if state is None:
+            return
+        with transaction.atomic(savepoint=False):
+            state.lines.all().delete()
+            self.changed()
+
+
+def get_cart_storage(request):
+    """Хранилище корзины из settings.CART_STORAGE"""
+    return import_string(settings.CART_STORAGE)(request)
@@ -1,3 +1,165 @@
-from django.test import TestCase
+import copy
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.db import connection
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from main.models import Category, Product
+from main.money import Money
+from users.models import User
+from .cart import Cart
+from .context_processors import cart
 
-# Create your tests here.
+
+class CartContextProcessorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books', slug='books')
+        cls.product = Product.objects.create(category=category, name='Book',
+                                             slug='book', price=Decimal('10.00'))
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def make_request(self):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        return request
+
+    def test_cart_is_not_built_until_used(self):
+        request = self.make_request()
+        with self.assertNumQueries(0):
+            context = cart(request)
+        self.assertFalse(request.session.accessed)
+        self.assertFalse(request.session.modified)
+
+        # Шаблон, который показывает корзину, по-прежнему её получает
+        request.session[settings.CART_SESSION_ID] = {
+            str(self.product.id): {'quantity': 2, 'price': '10.00'}}
+        context = cart(request)
+        self.assertEqual(Template('{{ cart|length }}').render(Context(context)), '2')
+
+    def admin_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_admin_pages_do_not_touch_cart(self):
+        self.client.force_login(self.admin)
+        queries = self.admin_queries()
+        self.assertFalse([sql for sql in queries if Product._meta.db_table in sql])
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+
+        # Ровно столько же запросов, сколько без контекст-процессора корзины
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['OPTIONS']['context_processors'].remove('cart.context_processors.cart')
+        with override_settings(TEMPLATES=templates):
+            baseline = self.admin_queries()
+        self.assertEqual(len(queries), len(baseline))
+
+
+class CartStorageTests:
+    """Общие проверки хранилищ корзины; подклассы задают CART_STORAGE"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books', slug='books')
+        cls.book = Product.objects.create(category=category, name='Book',
+                                          slug='book', price=Decimal('10.00'))
+        cls.pen = Product.objects.create(category=category, name='Pen',
+                                         slug='pen', price=Decimal('2.50'))
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        self.request.session = SessionStore()
+
+    def reload(self):
+        """Корзина заново из хранилища, как в следующем запросе"""
+        return Cart(self.request)
+
+    def test_add_set_remove_clear(self):
+        cart = self.reload()
+        cart.add(self.book, 2)
+        cart.add(self.book, 1)
+        cart.add(self.pen, 4)
+        self.assertEqual(self.reload().cart, {
+            str(self.book.id): {'quantity': 3, 'price': '10.00'},
+            str(self.pen.id): {'quantity': 4, 'price': '2.50'},
+        })
+
+        cart = self.reload()
+        cart.add(self.book, 5, override_quantity=True)
+        self.assertEqual(self.reload().cart[str(self.book.id)]['quantity'], 5)
+        self.assertEqual(self.reload().get_total_price(), Money(6000))
+
+        cart = self.reload()
+        cart.remove(self.pen)
+        self.assertEqual(list(self.reload().cart), [str(self.book.id)])
+
+        cart = self.reload()
+        cart.clear()
+        self.assertEqual(self.reload().cart, {})
+        self.assertEqual(len(self.reload()), 0)
+
+    def test_version_grows_with_every_change(self):
+        versions = [self.reload().version]
+        for change in (lambda cart: cart.add(self.book, 1),
+                       lambda cart: cart.add(self.book, 3, override_quantity=True),
+                       lambda cart: cart.remove(self.book),
+                       lambda cart: cart.clear()):
+            cart = self.reload()
+            change(cart)
+            self.assertEqual(self.reload().version, cart.version)
+            versions.append(cart.version)
+        self.assertEqual(versions, sorted(set(versions)))
+
+    def test_batch_bumps_version_once(self):
+        cart = self.reload()
+        cart.add(self.book, 1)
+        version = self.reload().version
+
+        cart = self.reload()
+        with cart.storage.batch():
+            cart.add(self.book, 2)
+            cart.add(self.pen, 1)
+            cart.remove(self.book)
+        self.assertEqual(cart.version, version + 1)
+        reloaded = self.reload()
+        self.assertEqual(reloaded.version, version + 1)
+        self.assertEqual(reloaded.cart, {str(self.pen.id): {'quantity': 1, 'price': '2.50'}})
+
+    def test_failed_batch_leaves_cart_unchanged(self):
+        cart = self.reload()
+        cart.add(self.book, 1)
+        before = self.reload()
+        # Сессионная корзина - тот же словарь, что в сессии
+        lines = copy.deepcopy(before.cart)
+
+        cart = self.reload()
+        with self.assertRaises(ValueError):
+            with cart.storage.batch():
+                cart.add(self.pen, 2)
+                cart.remove(self.book)
+                raise ValueError
+        after = self.reload()
+        self.assertEqual(after.cart, lines)
+        self.assertEqual(after.version, before.version)
+
+
+@override_settings(CART_STORAGE='cart.storage.SessionCartStorage')
+class SessionCartStorageTests(CartStorageTests, TestCase):
+    pass
+
+
+@override_settings(CART_STORAGE='cart.storage.CacheCartStorage')
+class CacheCartStorageTests(CartStorageTests, TestCase):
+    pass
+
+
+@override_settings(CART_STORAGE='cart.storage.DatabaseCartStorage')
+class DatabaseCartStorageTests(CartStorageTests, TestCase):
+    pass
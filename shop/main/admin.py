@@ -1,5 +1,22 @@
-from django.contrib import admin
-from .models import Product, Category
+from decimal import Decimal
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from .models import Product, Category, SearchEvent
+
+
+class ProductActionForm(ActionForm):
+    """Дополнительные поля в панели действий для массового изменения цен"""
+    # Те же границы, что у price_percent в ProductBulkUpdateSerializer:
+    # цена не может стать нулевой или отрицательной
+    price_percent = forms.DecimalField(required=False, max_digits=6,
+                                       decimal_places=2,
+                                       min_value=Decimal('-99.99'),
+                                       max_value=Decimal('1000'),
+                                       label='Цена, %')
+    discount = forms.DecimalField(required=False, max_digits=4,
+                                  decimal_places=2, min_value=0,
+                                  label='Скидка')
 
 
 @admin.register(Category)
@@ -10,8 +27,56 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'price', 'available', 
+    list_display = ['name', 'slug', 'price', 'available', 'stock',
                     'created', 'updated', 'discount']
     list_filter = ['available', 'created', 'updated']
-    list_editable = ['price', 'available', 'discount']
-    prepopulated_fields = {'slug': ('name',)}
\ No newline at end of file
+    list_editable = ['price', 'available', 'stock', 'discount']
+    prepopulated_fields = {'slug': ('name',)}
+    action_form = ProductActionForm
+    actions = ['change_price', 'set_discount',
+               'make_available', 'make_unavailable']
+
+    def _action_value(self, request, name):
+        field = self.action_form.base_fields[name]
+        try:
+            value = field.clean(request.POST.get(name))
+        except forms.ValidationError as error:
+            self.message_user(request, f'{field.label}: {" ".join(error.messages)}',
+                              messages.ERROR)
+            return None
+        if value is None:
+            self.message_user(request, f'Заполните поле "{field.label}"',
+                              messages.ERROR)
+        return value
+
+    @admin.action(description='Изменить цену на указанный %%')
+    def change_price(self, request, queryset):
+        percent = self._action_value(request, 'price_percent')
+        if percent is not None:
+            updated = queryset.apply_pricing(price_percent=percent)
+            self.message_user(request, f'Цена изменена у {updated} товаров')
+
+    @admin.action(description='Установить скидку')
+    def set_discount(self, request, queryset):
+        discount = self._action_value(request, 'discount')
+        if discount is not None:
+            updated = queryset.apply_pricing(discount=discount)
+            self.message_user(request, f'Скидка установлена у {updated} товаров')
+
+    @admin.action(description='Сделать доступными')
+    def make_available(self, request, queryset):
+        updated = queryset.apply_pricing(available=True)
+        self.message_user(request, f'Доступно {updated} товаров')
+
+    @admin.action(description='Сделать недоступными')
+    def make_unavailable(self, request, queryset):
+        updated = queryset.apply_pricing(available=False)
+        self.message_user(request, f'Недоступно {updated} товаров')
+
+
+@admin.register(SearchEvent)
+class SearchEventAdmin(admin.ModelAdmin):
+    list_display = ['query', 'result_count', 'latency_ms', 'cached', 'created']
+    list_filter = ['zero_results', 'cached', 'created']
+    search_fields = ['query']
+    readonly_fields = [field.name for field in SearchEvent._meta.fields]
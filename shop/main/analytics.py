@@ -0,0 +1,90 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.utils import timezone
+from .models import SearchEvent
+
+
+logger = logging.getLogger(__name__)
+
+
+class SearchEventBuffer:
+    """
+    Кольцевой буфер событий поиска. Запрос только добавляет событие
+    в deque (без блокировок и обращений к БД); фоновый поток раз
+    в SEARCH_EVENTS_FLUSH_INTERVAL секунд сбрасывает накопленное пачкой
+    в таблицу SearchEvent или в NDJSON-файл (SEARCH_EVENTS_FILE).
+    При переполнении теряются самые старые события.
+    """
+
+    def __init__(self, size):
+        self.events = deque(maxlen=size)
+        self.dropped = 0
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def record(self, **event):
+        event['created'] = timezone.now()
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        if self.thread is None:
+            self.start()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name='search-events', daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            time.sleep(settings.SEARCH_EVENTS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось сохранить события поиска')
+            finally:
+                connections.close_all()
+
+    def drain(self):
+        events = []
+        while True:
+            try:
+                events.append(self.events.popleft())
+            except IndexError:
+                return events
+
+    def flush(self):
+        """Сохраняет всё накопленное. Возвращает число событий"""
+        events = self.drain()
+        if not events:
+            return 0
+        path = settings.SEARCH_EVENTS_FILE
+        if path:
+            encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+            with open(path, 'a', encoding='utf-8') as stream:
+                stream.write(''.join(encoder.encode(event) + '\n' for event in events))
+        else:
+            SearchEvent.objects.bulk_create(
+                [SearchEvent(**event) for event in events],
+                batch_size=settings.SEARCH_EVENTS_BATCH_SIZE)
+        return len(events)
+
+
+search_events = SearchEventBuffer(settings.SEARCH_EVENTS_BUFFER_SIZE)
+
+
+def record_search(query, filters, result_count, zero_results, latency_ms, cached):
+    if not settings.SEARCH_EVENTS_ENABLED:
+        return
+    search_events.record(
+        query=query[:200], filters=filters, result_count=result_count,
+        zero_results=zero_results, latency_ms=latency_ms, cached=cached)
@@ -0,0 +1,236 @@
+import bisect
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import connections
+from django.dispatch import receiver
+from .cache import get_generation
+from .models import Product
+from .signals import catalog_changed
+
+
+logger = logging.getLogger(__name__)
+
+# Списки id длиннее этого почти ничего не говорят о совпадении
+# (частые триграммы вроде "  с") и только замедляют подбор с опечатками
+TRIGRAM_MAX_POSTINGS = 2000
+# Доля триграмм запроса, которые должны совпасть у кандидата
+TRIGRAM_MIN_SIMILARITY = 0.5
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall(text.lower().replace('ё', 'е')))
+
+
+def trigrams(text):
+    """Триграммы слов с дополнением пробелами, как в pg_trgm"""
+    grams = set()
+    for word in text.split():
+        padded = '  %s ' % word
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class AutocompleteIndex:
+    """
+    Индекс названий доступных товаров в памяти процесса.
+
+    entries - отсортированный список (суффикс названия с начала слова, id):
+    поиск по префиксу любого слова - bisect + последовательный просмотр.
+    trigram_map - триграмма -> список id для подбора с опечатками, если
+    по префиксу найдено меньше limit товаров.
+
+    Размер ограничен settings.AUTOCOMPLETE_MAX_PRODUCTS: если доступных
+    товаров больше, индекс не строится (complete = False) и вызывающий
+    код ищет в БД.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.products = {}
+        self.entries = []
+        self.trigram_map = {}
+        self.generation = None
+        self.complete = False
+
+    # Построение и изменения
+
+    def build(self):
+        max_products = settings.AUTOCOMPLETE_MAX_PRODUCTS
+        # Поколение берём до чтения, чтобы не пропустить изменения во время загрузки
+        generation = get_generation(Product)
+        rows = list(Product.objects.filter(available=True).order_by()
+                    .values_list('id', 'name', 'slug')[:max_products + 1])
+        index = AutocompleteIndex()
+        if len(rows) <= max_products:
+            for product_id, name, slug in rows:
+                index._add(product_id, name, slug, sort=False)
+            index.entries.sort()
+            index.complete = True
+        else:
+            logger.warning('Автодополнение: больше %d товаров, поиск идёт через БД',
+                           max_products)
+        with self.lock:
+            self.products = index.products
+            self.entries = index.entries
+            self.trigram_map = index.trigram_map
+            self.complete = index.complete
+            self.generation = generation
+
+    def _keys(self, name):
+        normalized = normalize(name)
+        words = normalized.split(' ')
+        keys, position = [], 0
+        for word in words:
+            keys.append(normalized[position:])
+            position += len(word) + 1
+        return normalized, keys
+
+    def _add(self, product_id, name, slug, sort=True):
+        normalized, keys = self._keys(name)
+        self.products[product_id] = (name, slug, normalized)
+        for key in keys:
+            if sort:
+                bisect.insort(self.entries, (key, product_id))
+            else:
+                self.entries.append((key, product_id))
+        for gram in trigrams(normalized):
+            self.trigram_map.setdefault(gram, []).append(product_id)
+
+    def _remove(self, product_id):
+        product = self.products.pop(product_id, None)
+        if product is None:
+            return
+        normalized, keys = self._keys(product[0])
+        for key in keys:
+            position = bisect.bisect_left(self.entries, (key, product_id))
+            if position < len(self.entries) and self.entries[position] == (key, product_id):
+                del self.entries[position]
+        for gram in trigrams(normalized):
+            postings = self.trigram_map.get(gram)
+            if postings is not None:
+                postings.remove(product_id)
+                if not postings:
+                    del self.trigram_map[gram]
+
+    def apply(self, instance, deleted, generation):
+        """
+        Точечное изменение по сигналу. Применяется, только если индекс
+        был актуален на предыдущем поколении - иначе изменения пропущены
+        и индекс перестроится целиком.
+        """
+        with self.lock:
+            if self.generation is None or generation != self.generation + 1:
+                return
+            if self.complete:
+                self._remove(instance.pk)
+                if not deleted and instance.available:
+                    if len(self.products) >= settings.AUTOCOMPLETE_MAX_PRODUCTS:
+                        self.complete = False
+                    else:
+                        self._add(instance.pk, instance.name, instance.slug)
+            self.generation = generation
+
+    # Поиск
+
+    def search(self, query, limit=10):
+        """Список (id, name, slug): сначала совпадения по префиксу слова, затем с опечатками"""
+        query = normalize(query)
+        if not query:
+            return []
+        with self.lock:
+            found = []
+            seen = set()
+            position = bisect.bisect_left(self.entries, (query,))
+            # Просматриваем с запасом: один товар может совпасть несколькими словами
+            while position < len(self.entries) and len(found) < limit * 4:
+                key, product_id = self.entries[position]
+                if not key.startswith(query):
+                    break
+                if product_id not in seen:
+                    seen.add(product_id)
+                    found.append(product_id)
+                position += 1
+            # Совпадение с начала названия выше, дальше - по алфавиту
+            found.sort(key=lambda product_id: (
+                not self.products[product_id][2].startswith(query),
+                self.products[product_id][0]))
+            found = found[:limit]
+            if len(found) < limit and len(query) >= 3:
+                found.extend(self._fuzzy(query, limit - len(found), seen))
+            return [(product_id,) + self.products[product_id][:2] for product_id in found]
+
+    def _fuzzy(self, query, limit, exclude):
+        grams = trigrams(query)
+        counts = Counter()
+        used = 0
+        for gram in grams:
+            postings = self.trigram_map.get(gram)
+            if postings is None:
+                continue
+            if len(postings) > TRIGRAM_MAX_POSTINGS:
+                continue
+            used += 1
+            counts.update(postings)
+        if not used:
+            return []
+        threshold = max(1, used * TRIGRAM_MIN_SIMILARITY)
+        return [product_id for product_id, count in counts.most_common()
+                if count >= threshold and product_id not in exclude][:limit]
+
+
+index = AutocompleteIndex()
+_refresh = {'checked': 0.0, 'running': False}
+_refresh_lock = threading.Lock()
+
+
+def _rebuild():
+    try:
+        index.build()
+    except Exception:
+        logger.exception('Не удалось перестроить индекс автодополнения')
+    finally:
+        _refresh['running'] = False
+        connections.close_all()
+
+
+def _schedule_rebuild():
+    with _refresh_lock:
+        if _refresh['running']:
+            return
+        _refresh['running'] = True
+    threading.Thread(target=_rebuild, name='autocomplete-rebuild', daemon=True).start()
+
+
+def get_index():
+    """
+    Индекс текущего процесса. Первый вызов строит его синхронно. Дальше
+    не чаще раза в AUTOCOMPLETE_CHECK_INTERVAL секунд сверяется поколение
+    товаров (изменения из других процессов): устаревший индекс
+    перестраивается в фоне, а запросы пока обслуживает старый.
+    """
+    if index.generation is None:
+        with _refresh_lock:
+            if index.generation is None:
+                index.build()
+        return index
+    now = time.monotonic()
+    if now - _refresh['checked'] >= settings.AUTOCOMPLETE_CHECK_INTERVAL:
+        _refresh['checked'] = now
+        if get_generation(Product) != index.generation:
+            _schedule_rebuild()
+    return index
+
+
+@receiver(catalog_changed, sender=Product)
+def product_changed(sender, instance, deleted, generation, **kwargs):
+    if instance is not None:
+        index.apply(instance, deleted, generation)
+    elif index.generation is not None:
+        # Массовая операция - точечно не применить, перестраиваем в фоне
+        _schedule_rebuild()
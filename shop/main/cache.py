@@ -0,0 +1,40 @@
+import time
+from django.core.cache import cache
+
+
+GENERATION_KEY = 'catalog:generation:%s'
+
+
+def _generation_key(model):
+    return GENERATION_KEY % model._meta.label_lower
+
+
+def _initial_generation():
+    # Стартуем с текущего времени, а не с 1: если счётчик вытеснят из кэша,
+    # новые номера не совпадут со старыми и устаревшие ответы не всплывут
+    return int(time.time() * 1000)
+
+
+def get_generations(*models):
+    """Текущие номера поколений для моделей каталога (одним запросом к кэшу)"""
+    keys = [_generation_key(model) for model in models]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _initial_generation(), timeout=None)
+            values[key] = cache.get(key)
+    return tuple(values[key] for key in keys)
+
+
+def get_generation(model):
+    return get_generations(model)[0]
+
+
+def bump_generation(model):
+    """Увеличивает поколение модели - все ключи со старым номером становятся недействительны"""
+    key = _generation_key(model)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_generation(), timeout=None)
+        return cache.incr(key)
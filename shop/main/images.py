@@ -0,0 +1,190 @@
+import logging
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps
+from .cache import bump_generation
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+# Размеры вариантов (вписываются в рамку, без увеличения маленьких исходников)
+VARIANT_SIZES = {
+    'thumb': (150, 150),
+    'card': (400, 400),
+    'detail': (1000, 1000),
+}
+# Расширение -> (формат Pillow, параметры сохранения)
+VARIANT_FORMATS = {
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+# Варианты лежат рядом с оригиналом в подкаталоге с этим именем
+VARIANTS_DIR = 'variants'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff')
+
+_executor = None
+# Оригиналы, для которых все варианты уже найдены на диске (файлы вариантов
+# не удаляются, а новый оригинал получает новое имя - перепроверять не нужно)
+_ready = set()
+READY_CACHE_SIZE = 10000
+
+
+def variant_prefix(name):
+    """
+    products/2025/01/01/foo.png -> products/2025/01/01/variants/foo.png,
+    к префиксу добавляется _<размер>.<расширение>. Расширение оригинала
+    остаётся в имени, чтобы варианты foo.png и foo.jpg не совпадали.
+    """
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, VARIANTS_DIR, filename)
+
+
+def variant_names(name):
+    """Имена всех вариантов оригинала name в хранилище"""
+    prefix = variant_prefix(name)
+    return [f'{prefix}_{size_name}.{extension}'
+            for size_name in VARIANT_SIZES for extension in VARIANT_FORMATS]
+
+
+def variants_ready(name):
+    """
+    Созданы ли все варианты для name. Пока генерация в пуле не закончилась
+    (или не удалась), варианты не отдаются клиентам - только оригинал.
+    """
+    if not name or not isinstance(default_storage, FileSystemStorage):
+        return False
+    if name in _ready:
+        return True
+    if not all(os.path.exists(default_storage.path(variant)) for variant in variant_names(name)):
+        return False
+    if len(_ready) >= READY_CACHE_SIZE:
+        _ready.clear()
+    _ready.add(name)
+    return True
+
+
+def generate_variants(path, force=False):
+    """
+    Создаёт все варианты для файла path (путь в файловой системе).
+    Уже существующие и не устаревшие варианты пропускаются, если не задан force.
+    Возвращает число записанных файлов. Выполняется в дочернем процессе,
+    поэтому работает только с путями, без ORM и хранилища.
+    """
+    directory, filename = os.path.split(path)
+    target_dir = os.path.join(directory, VARIANTS_DIR)
+    source_mtime = os.path.getmtime(path)
+
+    targets = []
+    for size_name, size in VARIANT_SIZES.items():
+        for extension, (image_format, options) in VARIANT_FORMATS.items():
+            target = os.path.join(target_dir, f'{filename}_{size_name}.{extension}')
+            if force or not os.path.exists(target) or os.path.getmtime(target) < source_mtime:
+                targets.append((target, size, image_format, options))
+    if not targets:
+        return 0
+
+    os.makedirs(target_dir, exist_ok=True)
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'L'):
+            # JPEG не поддерживает прозрачность - кладём на белый фон
+            background = Image.new('RGB', image.size, 'white')
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+        resized = {}
+        for target, size, image_format, options in targets:
+            if size not in resized:
+                variant = image.copy()
+                variant.thumbnail(size, Image.LANCZOS)
+                resized[size] = variant
+            # Пишем во временный файл, чтобы не отдать наполовину записанный
+            temporary = target + '.tmp'
+            resized[size].save(temporary, image_format, **options)
+            os.replace(temporary, target)
+    return len(targets)
+
+
+def _generate_logged(path):
+    try:
+        return generate_variants(path)
+    except Exception:
+        logger.exception('Не удалось создать варианты изображения %s', path)
+        return 0
+
+
+def _variants_done(future):
+    # Ответы каталога закэшированы без image_variants - сбрасываем их,
+    # когда варианты появились (в потоке пула, поэтому только кэш, без БД)
+    if not future.cancelled() and future.exception() is None and future.result():
+        bump_generation(Product)
+
+
+def get_executor(renew=False):
+    """
+    Пул процессов создаётся при первом обращении; renew - заменить пул,
+    сломанный упавшим дочерним процессом
+    """
+    global _executor
+    if renew and _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS)
+    return _executor
+
+
+def schedule_variants(name):
+    """
+    Ставит генерацию вариантов в пул процессов (вне запроса).
+    Варианты поддерживаются только для файлового хранилища.
+    При IMAGE_VARIANT_WORKERS = 0 генерация выполняется сразу.
+    """
+    if not name or not isinstance(default_storage, FileSystemStorage):
+        return
+    path = default_storage.path(name)
+    if not settings.IMAGE_VARIANT_WORKERS:
+        _generate_logged(path)
+        return
+    # Вызывается из on_commit: ошибка пула не должна ронять запрос,
+    # сохранение товара уже закоммичено
+    try:
+        try:
+            future = get_executor().submit(_generate_logged, path)
+        except BrokenProcessPool:
+            future = get_executor(renew=True).submit(_generate_logged, path)
+        future.add_done_callback(_variants_done)
+    except Exception:
+        logger.exception('Не удалось поставить в очередь варианты изображения %s', name)
+
+
+def _image_name(instance):
+    # Через __dict__, чтобы не загружать отложенное (defer/only) поле
+    value = instance.__dict__.get('image')
+    return getattr(value, 'name', value)
+
+
+@receiver(post_init, sender='main.Product')
+def product_loaded(sender, instance, **kwargs):
+    instance._saved_image_name = _image_name(instance)
+
+
+@receiver(post_save, sender='main.Product')
+def product_image_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    name = _image_name(instance)
+    if not created and name == getattr(instance, '_saved_image_name', None):
+        # Изображение не менялось (правка цены, остатка и т.п.)
+        return
+    instance._saved_image_name = name
+    if name:
+        transaction.on_commit(lambda: schedule_variants(name))
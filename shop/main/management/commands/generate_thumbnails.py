@@ -0,0 +1,71 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from main.cache import bump_generation
+from main.images import IMAGE_EXTENSIONS, VARIANTS_DIR, generate_variants
+from main.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий (thumb/card/detail, JPEG + WebP) для уже загруженных изображений товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default='products',
+            help='Каталог внутри MEDIA_ROOT (по умолчанию products)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Количество процессов',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать варианты, даже если они уже есть',
+        )
+
+    def handle(self, *args, **options):
+        root = os.path.join(settings.MEDIA_ROOT, options['path'])
+        if not os.path.isdir(root):
+            raise CommandError(f'Каталог {root} не найден')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+
+        paths = list(self.find_images(root))
+        started = time.monotonic()
+        written = failed = 0
+        force = options['force']
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(generate_variants, path, force): path for path in paths}
+            for future, path in futures.items():
+                try:
+                    written += future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{path}: {e}')
+
+        if written:
+            # Закэшированные ответы каталога ещё без image_variants
+            bump_generation(Product)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Обработано {len(paths)} изображений за {elapsed:.1f} c: '
+                f'записано файлов {written}, ошибок {failed}'
+            )
+        )
+
+    def find_images(self, root):
+        for directory, subdirectories, filenames in os.walk(root):
+            # Уже созданные варианты не обрабатываем повторно
+            if VARIANTS_DIR in subdirectories:
+                subdirectories.remove(VARIANTS_DIR)
+            for filename in filenames:
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(directory, filename)
@@ -0,0 +1,203 @@
+import csv
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_slug
+from django.db import DatabaseError, transaction
+from main.models import Category, Product
+from main.signals import batch_catalog_changes
+
+
+REQUIRED_FIELDS = ('slug', 'name', 'category', 'price')
+# Поля, которые обновляются при совпадении slug (если они есть во входных данных)
+UPDATABLE_FIELDS = ('name', 'category', 'price', 'discount', 'available',
+                    'description', 'image')
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'on')
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Массовый импорт товаров из CSV или JSONL (upsert по slug пачками)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Путь к файлу CSV/JSONL или "-" для stdin',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Формат входных данных (по умолчанию - по расширению файла)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одной транзакции',
+        )
+        parser.add_argument(
+            '--create-categories',
+            action='store_true',
+            help='Создавать отсутствующие категории (имя = slug)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        self.verbosity = options['verbosity']
+        self.create_categories = options['create_categories']
+        # slug -> id, загружается один раз
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        try:
+            rows = self.read_csv(stream) if input_format == 'csv' else self.read_jsonl(stream)
+            self.run(rows, batch_size)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def read_csv(self, stream):
+        reader = csv.DictReader(stream)
+        for line_number, row in enumerate(reader, start=2):
+            yield line_number, row
+
+    def read_jsonl(self, stream):
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = RowError(f'invalid JSON: {e}')
+            if not isinstance(row, (dict, RowError)):
+                row = RowError('expected a JSON object')
+            yield line_number, row
+
+    def run(self, rows, batch_size):
+        started = time.monotonic()
+        processed = imported = 0
+        row_errors = batch_errors = 0
+        batch = {}
+
+        # Кэш каталога сбрасывается один раз в конце, а не на каждую пачку
+        with batch_catalog_changes():
+            for line_number, row in rows:
+                processed += 1
+                try:
+                    if isinstance(row, RowError):
+                        raise row
+                    product = self.build_product(row)
+                except RowError as e:
+                    row_errors += 1
+                    self.stderr.write(f'Строка {line_number}: {e}')
+                    continue
+                # Повтор slug внутри пачки - берём последнюю версию.
+                # Обновляются только поля, которые есть в самой строке
+                batch[product.slug] = (product, tuple(field for field in UPDATABLE_FIELDS
+                                                      if field in row))
+                if len(batch) >= batch_size:
+                    ok, failed = self.flush(batch)
+                    imported += ok
+                    batch_errors += failed
+                    batch = {}
+            if batch:
+                ok, failed = self.flush(batch)
+                imported += ok
+                batch_errors += failed
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Обработано {processed} строк за {elapsed:.1f} c ({rate:.0f} строк/с): '
+                f'загружено {imported}, ошибок в строках {row_errors}, '
+                f'неудачных пачек {batch_errors}'
+            )
+        )
+
+    def build_product(self, row):
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            raise RowError('missing fields: ' + ', '.join(missing))
+
+        product = Product(
+            slug=str(row['slug']).strip(),
+            name=str(row['name']).strip(),
+            category_id=self.get_category_id(str(row['category']).strip()),
+            price=self.parse_decimal(row['price'], 'price'),
+            description=row.get('description') or '',
+            image=row.get('image') or '',
+        )
+        if 'discount' in row:
+            product.discount = self.parse_decimal(row['discount'] or 0, 'discount')
+        if 'available' in row:
+            value = row['available']
+            product.available = value if isinstance(value, bool) else str(value).strip().lower() in TRUE_VALUES
+        return product
+
+    def get_category_id(self, slug):
+        category_id = self.categories.get(slug)
+        if category_id is None:
+            if not self.create_categories:
+                raise RowError(f'unknown category "{slug}"')
+            # Проверяем до INSERT: ошибка БД здесь оборвала бы весь импорт
+            max_length = Category._meta.get_field('slug').max_length
+            if len(slug) > max_length:
+                raise RowError(f'category "{slug}" is longer than {max_length} characters')
+            try:
+                validate_slug(slug)
+            except ValidationError:
+                raise RowError(f'invalid category slug "{slug}"')
+            try:
+                category_id = Category.objects.get_or_create(slug=slug, defaults={'name': slug})[0].id
+            except DatabaseError as e:
+                raise RowError(f'category "{slug}" not created: {e}')
+            self.categories[slug] = category_id
+        return category_id
+
+    def parse_decimal(self, value, field):
+        try:
+            return Decimal(str(value).strip())
+        except InvalidOperation:
+            raise RowError(f'invalid {field} "{value}"')
+
+    def flush(self, batch):
+        """
+        Записывает пачку одной транзакцией: по одному bulk_create на каждый
+        набор обновляемых полей (обычно он один). Возвращает (записано, ошибок пачек)
+        """
+        started = time.monotonic()
+        products = [product for product, _ in batch.values()]
+        groups = {}
+        for product, update_fields in batch.values():
+            groups.setdefault(update_fields, []).append(product)
+        try:
+            with transaction.atomic():
+                for update_fields, group in groups.items():
+                    Product.objects.bulk_create(
+                        group,
+                        update_conflicts=True,
+                        unique_fields=['slug'],
+                        update_fields=list(update_fields) + ['updated'],
+                    )
+        except DatabaseError as e:
+            self.stderr.write(
+                f'Пачка {products[0].slug}..{products[-1].slug} не загружена: {e}'
+            )
+            return 0, 1
+        if self.verbosity >= 2:
+            elapsed = time.monotonic() - started
+            rate = len(products) / elapsed if elapsed else 0
+            self.stdout.write(f'Пачка из {len(products)} строк: {rate:.0f} строк/с')
+        return len(products), 0
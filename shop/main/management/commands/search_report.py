@@ -0,0 +1,137 @@
+import json
+import math
+from collections import Counter
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from main.models import SearchEvent
+
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    """Значение перцентиля (nearest-rank) по отсортированному списку"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Отчёт по поиску: перцентили задержки и частые запросы без результатов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=float,
+            default=7,
+            help='За сколько последних дней строить отчёт',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Сколько запросов без результатов показать',
+        )
+        parser.add_argument(
+            '--file',
+            help='Читать события из NDJSON-файла (SEARCH_EVENTS_FILE), а не из БД',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0 or options['top'] < 1:
+            raise CommandError('--days and --top must be positive')
+        since = timezone.now() - timedelta(days=options['days'])
+        if options['file']:
+            report = self.report_from_file(options['file'], since, options['top'])
+        else:
+            report = self.report_from_db(since, options['top'])
+        self.write_report(report, options['days'])
+
+    def report_from_db(self, since, top):
+        events = SearchEvent.objects.filter(created__gte=since)
+        totals = events.aggregate(
+            total=Count('id'),
+            zero=Count('id', filter=Q(zero_results=True)),
+            cached=Count('id', filter=Q(cached=True)),
+            average=Avg('latency_ms'),
+        )
+        # Перцентиль - одна строка со смещением в отсортированной выборке
+        ordered = events.order_by('latency_ms').values_list('latency_ms', flat=True)
+        latencies = {}
+        for percent in PERCENTILES:
+            if totals['total']:
+                offset = max(0, math.ceil(percent / 100 * totals['total']) - 1)
+                latencies[percent] = ordered[offset]
+        zero_queries = list(
+            events.filter(zero_results=True).exclude(query='')
+            .values_list('query').annotate(count=Count('id'))
+            .order_by('-count', 'query')[:top])
+        return totals, latencies, zero_queries
+
+    def report_from_file(self, path, since, top):
+        latencies_list = []
+        zero = Counter()
+        totals = {'total': 0, 'zero': 0, 'cached': 0, 'average': None}
+        try:
+            stream = open(path, encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Не удалось открыть {path}: {e}')
+        skipped = 0
+        with stream:
+            for line in stream:
+                if not line.strip():
+                    continue
+                # Повреждённая строка (например, оборванная при ротации файла)
+                # не должна обрывать весь отчёт - пропускаем и считаем
+                try:
+                    event = json.loads(line)
+                    created = parse_datetime(event['created'])
+                    if created is None:
+                        raise ValueError('invalid created')
+                    if created < since:
+                        continue
+                    latency = float(event['latency_ms'])
+                    cached, zero_results = bool(event['cached']), bool(event['zero_results'])
+                    query = event['query']
+                except (ValueError, TypeError, KeyError):
+                    skipped += 1
+                    continue
+                totals['total'] += 1
+                totals['cached'] += cached
+                latencies_list.append(latency)
+                if zero_results:
+                    totals['zero'] += 1
+                    if query:
+                        zero[query] += 1
+        if skipped:
+            self.stderr.write(f'Пропущено повреждённых строк: {skipped}')
+        latencies_list.sort()
+        if latencies_list:
+            totals['average'] = sum(latencies_list) / len(latencies_list)
+        latencies = {percent: percentile(latencies_list, percent) for percent in PERCENTILES
+                     if latencies_list}
+        zero_queries = sorted(zero.items(), key=lambda item: (-item[1], item[0]))[:top]
+        return totals, latencies, zero_queries
+
+    def write_report(self, report, days):
+        totals, latencies, zero_queries = report
+        self.stdout.write(f'Поисковых запросов за {days:g} дн.: {totals["total"]}')
+        if not totals['total']:
+            return
+        self.stdout.write(
+            f'Без результатов: {totals["zero"]} '
+            f'({totals["zero"] / totals["total"]:.1%}), '
+            f'из кэша: {totals["cached"]} ({totals["cached"] / totals["total"]:.1%})'
+        )
+        self.stdout.write(
+            'Задержка, мс: среднее %.1f, %s' % (
+                totals['average'],
+                ', '.join(f'p{percent} {value:.1f}' for percent, value in latencies.items()))
+        )
+        if zero_queries:
+            self.stdout.write('Частые запросы без результатов:')
+            for query, count in zero_queries:
+                self.stdout.write(f'{count:>8}  {query}')
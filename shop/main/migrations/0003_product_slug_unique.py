@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:16
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def make_slugs_unique(apps, schema_editor):
+    # Первый (по id) товар сохраняет slug, остальным дописывается их id
+    Product = apps.get_model('main', 'Product')
+    max_length = Product._meta.get_field('slug').max_length
+    duplicates = (Product.objects.values('slug').annotate(count=Count('pk'))
+                  .filter(count__gt=1).values_list('slug', flat=True))
+    for slug in list(duplicates):
+        ids = Product.objects.filter(slug=slug).order_by('pk').values_list('pk', flat=True)
+        for product_id in list(ids)[1:]:
+            suffix, attempt = '-%d' % product_id, 1
+            candidate = slug[:max_length - len(suffix)] + suffix
+            while Product.objects.filter(slug=candidate).exists():
+                attempt += 1
+                suffix = '-%d-%d' % (product_id, attempt)
+                candidate = slug[:max_length - len(suffix)] + suffix
+            Product.objects.filter(pk=product_id).update(slug=candidate)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_product_discounted_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(make_slugs_unique, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(unique=True),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:22
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Триггеры, функции и GIN-индекс существуют только в PostgreSQL;
+# на SQLite (тесты) поиск работает через icontains (см. main.search)
+FORWARD_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION main_product_search_vector(
+        product_name text, product_description text, category_name text
+    ) RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('russian', coalesce(product_name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(category_name, '')), 'B')
+            || setweight(to_tsvector('russian', coalesce(product_description, '')), 'C')
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION main_product_search_vector_trigger() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := main_product_search_vector(
+            NEW.name, NEW.description,
+            (SELECT name FROM main_category WHERE id = NEW.category_id));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER main_product_search_vector_update
+        BEFORE INSERT OR UPDATE OF name, description, category_id ON main_product
+        FOR EACH ROW EXECUTE FUNCTION main_product_search_vector_trigger()
+    """,
+    # Переименование категории меняет вес B у всех её товаров
+    """
+    CREATE OR REPLACE FUNCTION main_category_search_vector_trigger() RETURNS trigger AS $$
+    BEGIN
+        UPDATE main_product
+           SET search_vector = main_product_search_vector(name, description, NEW.name)
+         WHERE category_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER main_category_search_vector_update
+        AFTER UPDATE OF name ON main_category
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION main_category_search_vector_trigger()
+    """,
+    """
+    UPDATE main_product AS p
+       SET search_vector = main_product_search_vector(p.name, p.description, c.name)
+      FROM main_category AS c
+     WHERE c.id = p.category_id
+    """,
+    "CREATE INDEX main_product_search_vector_gin ON main_product USING gin (search_vector)",
+]
+
+BACKWARD_SQL = [
+    "DROP INDEX IF EXISTS main_product_search_vector_gin",
+    "DROP TRIGGER IF EXISTS main_category_search_vector_update ON main_category",
+    "DROP FUNCTION IF EXISTS main_category_search_vector_trigger()",
+    "DROP TRIGGER IF EXISTS main_product_search_vector_update ON main_product",
+    "DROP FUNCTION IF EXISTS main_product_search_vector_trigger()",
+    "DROP FUNCTION IF EXISTS main_product_search_vector(text, text, text)",
+]
+
+
+def run_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_product_slug_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_sql(FORWARD_SQL), run_sql(BACKWARD_SQL)),
+    ]
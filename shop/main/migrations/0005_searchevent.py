@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(blank=True, max_length=200)),
+                ('filters', models.JSONField(blank=True, default=dict)),
+                ('result_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('zero_results', models.BooleanField(default=False)),
+                ('latency_ms', models.FloatField()),
+                ('cached', models.BooleanField(default=False)),
+                ('created', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-created'],
+                'indexes': [models.Index(fields=['-created'], name='main_search_created_dc1cac_idx'), models.Index(fields=['zero_results', 'query'], name='main_search_zero_re_fe6447_idx')],
+            },
+        ),
+    ]
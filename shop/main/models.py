@@ -1,5 +1,68 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Now, Round
 from django.urls import reverse
+from .money import Money
+from .signals import notify_catalog_changed
+
+
+class CatalogQuerySet(models.QuerySet):
+    """
+    Массовые операции не вызывают post_save, поэтому сбрасываем
+    кэш каталога здесь - один раз на операцию (bulk_update внутри
+    тоже идёт через update()).
+    """
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            notify_catalog_changed(self.model)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            notify_catalog_changed(self.model)
+        return objs
+
+
+class ProductQuerySet(CatalogQuerySet):
+
+    def apply_pricing(self, price=None, price_percent=None,
+                      discount=None, available=None):
+        """
+        Массовое изменение цены/скидки/доступности одним UPDATE.
+        price_percent меняет цену относительно текущей (например, -10 или 15).
+        discounted_price пересчитывает сама БД. Возвращает число строк.
+        """
+        changes = {}
+        if price is not None:
+            changes['price'] = price
+        elif price_percent is not None:
+            changes['price'] = Round(F('price') * (100 + price_percent) / 100, 2)
+        if discount is not None:
+            changes['discount'] = discount
+        if available is not None:
+            changes['available'] = available
+        if not changes:
+            return 0
+        # auto_now не срабатывает при update(), а от updated зависят ETag'и
+        changes['updated'] = Now()
+        return self.update(**changes)
+
+    def change_stock(self, delta):
+        """
+        stock = stock + delta одним условным UPDATE: списание (delta < 0)
+        проходит, только если остатка хватает, товары без учёта остатка
+        не затрагиваются. Возвращает число строк. Кэш каталога здесь не
+        сбрасывается: в ответах виден только признак in_stock, и о его
+        смене сообщает вызывающий код (см. orders.checkout).
+        """
+        queryset = self.filter(stock__isnull=False)
+        if delta < 0:
+            queryset = queryset.filter(stock__gte=-delta)
+        return models.QuerySet.update(queryset, stock=F('stock') + delta)
 
 
 class Category(models.Model):
@@ -8,6 +71,8 @@ class Category(models.Model):
     slug = models.SlugField(max_length=20,
                             unique=True)
 
+    objects = CatalogQuerySet.as_manager()
+
 
     class Meta:
         ordering = ['name']
@@ -30,18 +95,36 @@ class Product(models.Model):
                                  related_name='products',
                                  on_delete=models.CASCADE)
     name = models.CharField(max_length=50)
-    slug = models.SlugField(max_length=50)
+    slug = models.SlugField(max_length=50,
+                            unique=True)
     image = models.ImageField(upload_to='products/%Y/%m/%d',
                               blank=True)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10,
                                 decimal_places=2)
     available = models.BooleanField(default=True)
+    # Остаток на складе; None - остаток не ведётся (продаётся без ограничений).
+    # Списывается при оформлении заказа (orders.checkout.reserve_stock)
+    stock = models.PositiveIntegerField(null=True,
+                                        blank=True)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     discount = models.DecimalField(default=0.00,
                                    max_digits=4,
                                    decimal_places=2)
+    # Цена со скидкой считается самой БД, поэтому по ней можно
+    # сортировать и фильтровать индексом (в т.ч. после queryset.update())
+    discounted_price = models.GeneratedField(
+        expression=Round(F('price') - F('price') * F('discount') / 100, 2),
+        output_field=models.DecimalField(max_digits=10,
+                                         decimal_places=2),
+        db_persist=True)
+    # Полнотекстовый индекс (name - A, категория - B, description - C).
+    # В PostgreSQL заполняется триггерами, там же GIN-индекс (миграция 0004)
+    search_vector = SearchVectorField(null=True,
+                                      editable=False)
+
+    objects = ProductQuerySet.as_manager()
     
 
     class Meta:
@@ -50,6 +133,7 @@ class Product(models.Model):
             models.Index(fields=['id', 'slug']),
             models.Index(fields=['name']),
             models.Index(fields=['-created']),
+            models.Index(fields=['discounted_price']),
         ]
 
 
@@ -57,12 +141,51 @@ class Product(models.Model):
         return self.name
     
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            # После UPDATE значение discounted_price в объекте устарело,
+            # при следующем обращении оно перечитается из БД
+            self.__dict__.pop('discounted_price', None)
+
+
     def get_absolute_url(self):
         return reverse("main:product_detail",
                        args=[self.slug])
     
 
+    @property
+    def in_stock(self):
+        return self.stock is None or self.stock > 0
+
+
     def sell_price(self):
-        if self.discount:
-            return round(self.price - self.price * self.discount / 100, 2)
-        return self.price
\ No newline at end of file
+        # Money; округление как у ROUND() в БД, чтобы совпадать с discounted_price
+        return Money.from_decimal(self.price).discounted(self.discount)
+
+
+class SearchEvent(models.Model):
+    """Запрос к поиску (пишется пачками из main.analytics)"""
+    query = models.CharField(max_length=200,
+                             blank=True)
+    filters = models.JSONField(default=dict,
+                               blank=True)
+    result_count = models.PositiveIntegerField(null=True,
+                                               blank=True)
+    zero_results = models.BooleanField(default=False)
+    latency_ms = models.FloatField()
+    cached = models.BooleanField(default=False)
+    created = models.DateTimeField()
+
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(fields=['-created']),
+            models.Index(fields=['zero_results', 'query']),
+        ]
+
+
+    def __str__(self):
+        return self.query
@@ -0,0 +1,110 @@
+from decimal import Decimal, ROUND_HALF_UP
+from functools import total_ordering
+
+
+@total_ordering
+class Money:
+    """
+    Денежная сумма в минимальных единицах (центах) - целое число.
+    Сложение, умножение на количество и сравнение - целочисленная
+    арифметика без Decimal. В Decimal (для моделей) и float (для JSON)
+    сумма переводится только на границе.
+    """
+    __slots__ = ('cents',)
+
+    def __init__(self, cents=0):
+        self.cents = cents
+
+    @classmethod
+    def from_decimal(cls, value):
+        """Из Decimal, строки ('10.50') или int; округление до цента половиной вверх"""
+        if isinstance(value, Money):
+            return value
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value))
+        return cls(int(value.scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+
+    def discounted(self, percent):
+        """
+        Сумма со скидкой percent (Decimal, до сотых процента), как
+        ROUND(price - price * discount / 100, 2) в БД (колонка discounted_price).
+        """
+        if not percent:
+            return self
+        # Скидка в сотых долях процента: 12.5% -> 1250 из 10000
+        basis_points = int(percent * 100)
+        value = self.cents * (10000 - basis_points)
+        # Половина - от нуля, как у ROUND() в PostgreSQL
+        if value >= 0:
+            return Money((value + 5000) // 10000)
+        return Money(-((-value + 5000) // 10000))
+
+    def to_decimal(self):
+        return Decimal(self.cents).scaleb(-2)
+
+    def __float__(self):
+        # Деление int на 100 округляется корректно, и repr() даёт
+        # ровно два знака (10.45, а не 10.450000000000001)
+        return self.cents / 100
+
+    def __str__(self):
+        sign = '-' if self.cents < 0 else ''
+        units, cents = divmod(abs(self.cents), 100)
+        return f'{sign}{units}.{cents:02d}'
+
+    def __repr__(self):
+        return f'Money({self})'
+
+    def __add__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents + other.cents)
+        if other == 0:
+            return self
+        return NotImplemented
+
+    # sum() начинает с 0
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents - other.cents)
+        return NotImplemented
+
+    def __mul__(self, quantity):
+        if isinstance(quantity, int):
+            return Money(self.cents * quantity)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            return self.cents == other.cents
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, Money):
+            return self.cents < other.cents
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.cents)
+
+
+def money_sum(values):
+    """Сумма Money как один целочисленный sum() по центам"""
+    return Money(sum(value.cents for value in values))
+
+
+def money_to_json(value):
+    """
+    Сумма (Money, Decimal или строка) -> число для JSON: переводится через
+    центы, поэтому в ответе ровно два знака (10.45, а не 10.450000000000001)
+    """
+    return float(Money.from_decimal(value))
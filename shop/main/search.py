@@ -0,0 +1,97 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Count, F, Q
+
+
+# Конфигурация должна совпадать с той, что в триггерах (миграция 0004)
+SEARCH_CONFIG = 'russian'
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def build_tsquery(text):
+    """
+    'смарт теле' -> 'смарт:* & теле:*': все слова обязательны, каждое
+    ищется по префиксу. Спецсимволы tsquery из ввода отбрасываются.
+    """
+    return ' & '.join(f'{word}:*' for word in _WORD_RE.findall(text.lower()))
+
+
+def full_text_supported():
+    return connection.vendor == 'postgresql'
+
+
+def search_products(queryset, text):
+    """
+    Фильтрует товары по строке поиска. Возвращает (queryset, ranked):
+    в PostgreSQL - поиск по search_vector (GIN-индекс) с аннотацией rank
+    (ts_rank с весами name > категория > description); на других БД
+    (SQLite в тестах) - icontains по тем же полям, без rank.
+    """
+    if not full_text_supported():
+        return queryset.filter(
+            Q(name__icontains=text) |
+            Q(description__icontains=text) |
+            Q(category__name__icontains=text)
+        ), False
+
+    tsquery = build_tsquery(text)
+    if not tsquery:
+        return queryset.none(), False
+    query = SearchQuery(tsquery, search_type='raw', config=SEARCH_CONFIG)
+    queryset = queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query))
+    return queryset, True
+
+
+def search_facets(queryset, price_bounds):
+    """
+    Фасеты по отфильтрованной выборке одним сгруппированным запросом:
+    GROUP BY категория, в нём COUNT(*) и COUNT(*) FILTER (...) на каждый
+    ценовой интервал. Итоги по интервалам суммируются по категориям.
+
+    price_bounds - возрастающие границы [100, 500] -> интервалы
+    (<100), [100, 500), (>=500) по цене со скидкой.
+    """
+    buckets = []
+    lower = None
+    for upper in list(price_bounds) + [None]:
+        condition = Q()
+        if lower is not None:
+            condition &= Q(discounted_price__gte=lower)
+        if upper is not None:
+            condition &= Q(discounted_price__lt=upper)
+        buckets.append((lower, upper, condition))
+        lower = upper
+
+    aggregates = {'count': Count('id')}
+    for number, (lower, upper, condition) in enumerate(buckets):
+        aggregates['price_%d' % number] = Count('id', filter=condition)
+    rows = (queryset.order_by()
+            .values('category_id', 'category__name', 'category__slug')
+            .annotate(**aggregates))
+
+    categories = []
+    totals = [0] * len(buckets)
+    for row in rows:
+        categories.append({
+            'id': row['category_id'],
+            'name': row['category__name'],
+            'slug': row['category__slug'],
+            'count': row['count'],
+        })
+        for number in range(len(buckets)):
+            totals[number] += row['price_%d' % number]
+    categories.sort(key=lambda category: (-category['count'], category['name']))
+    return {
+        'categories': categories,
+        'price': [
+            {
+                'min': float(lower) if lower is not None else None,
+                'max': float(upper) if upper is not None else None,
+                'count': count,
+            }
+            for (lower, upper, condition), count in zip(buckets, totals)
+        ],
+    }
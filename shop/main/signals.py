@@ -0,0 +1,60 @@
+import threading
+from contextlib import contextmanager
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from .cache import bump_generation
+
+
+# Отправляется после коммита каждого изменения каталога, когда поколение
+# модели уже увеличено. Аргументы: sender (модель), instance (объект или None
+# для массовых операций), deleted, generation (новый номер поколения)
+catalog_changed = Signal()
+
+_batch = threading.local()
+
+
+@contextmanager
+def batch_catalog_changes():
+    """
+    Внутри блока уведомления об изменениях не отправляются, а копятся;
+    на выходе уходит одно событие (без instance) на каждую изменённую модель.
+    Нужно для массовой загрузки, чтобы не сбрасывать кэш на каждую пачку.
+    """
+    if getattr(_batch, 'models', None) is not None:
+        # Вложенный блок - события накопит внешний
+        yield
+        return
+    _batch.models = models = set()
+    try:
+        yield
+    finally:
+        _batch.models = None
+        for model in models:
+            notify_catalog_changed(model)
+
+
+def notify_catalog_changed(model, instance=None, deleted=False):
+    """Откладывает сброс кэша каталога до коммита текущей транзакции"""
+    models = getattr(_batch, 'models', None)
+    if models is not None:
+        models.add(model)
+        return
+
+    def send():
+        generation = bump_generation(model)
+        catalog_changed.send(sender=model, instance=instance,
+                             deleted=deleted, generation=generation)
+    transaction.on_commit(send)
+
+
+@receiver(post_save, sender='main.Product')
+@receiver(post_save, sender='main.Category')
+def catalog_saved(sender, instance, **kwargs):
+    notify_catalog_changed(sender, instance)
+
+
+@receiver(post_delete, sender='main.Product')
+@receiver(post_delete, sender='main.Category')
+def catalog_deleted(sender, instance, **kwargs):
+    notify_catalog_changed(sender, instance, deleted=True)
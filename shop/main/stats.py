@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+from .cache import get_generation
+from .models import Product
+
+
+CATEGORY_STATS_KEY = 'catalog:category-stats:%s'
+
+
+def get_category_stats():
+    """
+    Количество товаров и диапазон цен (со скидкой, по доступным товарам)
+    для всех категорий: {category_id: {'product_count', 'available_count',
+    'min_price', 'max_price'}}; категорий без товаров в словаре нет.
+    Считается одним сгруппированным запросом и хранится в кэше до следующего
+    изменения товаров. Отдаётся через api.serializers.CategoryStatsSerializer.
+    """
+    key = CATEGORY_STATS_KEY % get_generation(Product)
+    stats = cache.get(key)
+    if stats is None:
+        available = Q(available=True)
+        rows = Product.objects.order_by().values('category_id').annotate(
+            product_count=Count('id'),
+            available_count=Count('id', filter=available),
+            min_price=Min('discounted_price', filter=available),
+            max_price=Max('discounted_price', filter=available),
+        )
+        stats = {row.pop('category_id'): row for row in rows}
+        cache.set(key, stats, settings.CATALOG_CACHE_TIMEOUT)
+    return stats
@@ -1,3 +1,74 @@
-from django.test import TestCase
+from decimal import Decimal
+from django.test import SimpleTestCase
+from main.money import Money, money_sum, money_to_json
 
-# Create your tests here.
+
+class MoneyTests(SimpleTestCase):
+    """Money - целые центы; округление как у колонки discounted_price"""
+
+    def test_from_decimal_rounds_half_up(self):
+        self.assertEqual(Money.from_decimal(Decimal('10.455')), Money(1046))
+        self.assertEqual(Money.from_decimal(Decimal('10.454')), Money(1045))
+        self.assertEqual(Money.from_decimal('0.50'), Money(50))
+        self.assertEqual(Money.from_decimal(7), Money(700))
+        money = Money(123)
+        self.assertIs(Money.from_decimal(money), money)
+
+    def test_discounted_rounds_half_away_from_zero(self):
+        # 10.05 * 0.9 = 9.045 -> 9.05
+        self.assertEqual(Money(1005).discounted(Decimal('10')), Money(905))
+        # 0.15 * 0.5 = 0.075 -> 0.08
+        self.assertEqual(Money(15).discounted(Decimal('50')), Money(8))
+        self.assertEqual(Money(-15).discounted(Decimal('50')), Money(-8))
+        # 0.99 * 0.67 = 0.6633 -> 0.66
+        self.assertEqual(Money(99).discounted(Decimal('33')), Money(66))
+
+    def test_discounted_fractional_percent(self):
+        # 19.99 * 0.875 = 17.49125 -> 17.49
+        self.assertEqual(Money(1999).discounted(Decimal('12.5')), Money(1749))
+        # 100.00 * (1 - 0.0001) = 99.99
+        self.assertEqual(Money(10000).discounted(Decimal('0.01')), Money(9999))
+        self.assertEqual(Money(1999).discounted(Decimal('100')), Money(0))
+
+    def test_discounted_without_discount(self):
+        money = Money(1999)
+        self.assertIs(money.discounted(Decimal('0')), money)
+        self.assertIs(money.discounted(None), money)
+
+    def test_arithmetic(self):
+        self.assertEqual(Money(150) + Money(275), Money(425))
+        self.assertEqual(Money(150) - Money(275), Money(-125))
+        self.assertEqual(Money(150) * 3, Money(450))
+        self.assertEqual(3 * Money(150), Money(450))
+        self.assertEqual(-Money(150), Money(-150))
+        self.assertEqual(sum([Money(1), Money(2), Money(3)]), Money(6))
+        self.assertEqual(money_sum([Money(10), Money(20)]), Money(30))
+        self.assertEqual(money_sum([]), Money(0))
+        self.assertFalse(Money(0))
+        self.assertTrue(Money(1))
+
+    def test_rejects_inexact_operands(self):
+        with self.assertRaises(TypeError):
+            Money(100) * 1.5
+        with self.assertRaises(TypeError):
+            Money(100) + Decimal('1')
+        with self.assertRaises(TypeError):
+            Money(100) - 1
+
+    def test_comparison_and_hash(self):
+        self.assertLess(Money(99), Money(100))
+        self.assertGreaterEqual(Money(100), Money(100))
+        self.assertEqual(sorted([Money(3), Money(1), Money(2)]),
+                         [Money(1), Money(2), Money(3)])
+        self.assertEqual(len({Money(5), Money(5), Money(6)}), 2)
+        self.assertNotEqual(Money(100), Decimal('1.00'))
+
+    def test_conversions(self):
+        self.assertEqual(Money(1045).to_decimal(), Decimal('10.45'))
+        self.assertEqual(str(Money(1045)), '10.45')
+        self.assertEqual(str(Money(-5)), '-0.05')
+        self.assertEqual(repr(Money(700)), 'Money(7.00)')
+        self.assertEqual(repr(float(Money(1045))), '10.45')
+        self.assertEqual(money_to_json(Decimal('10.45')), 10.45)
+        self.assertEqual(money_to_json('0.1'), 0.1)
+        self.assertEqual(money_to_json(Money(30)), 0.3)
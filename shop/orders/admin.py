@@ -20,7 +20,9 @@ order_stripe_payment.short_description = 'Stripe payment'
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'first_name', 'last_name', 'email',
-                    'address', 'postal_code', 'city', 'paid',
+                    'address', 'postal_code', 'city', 'paid', 'reserved_until',
+                    'total_cost', 'item_count',
                     order_stripe_payment, 'created', 'updated']
     list_filter = ['paid', 'created', 'updated']
+    readonly_fields = ['total_cost', 'item_count']
     inlines = [OrderItemInLine]
\ No newline at end of file
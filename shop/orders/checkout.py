@@ -0,0 +1,132 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from main.models import Product
+from main.money import money_sum
+from main.signals import notify_catalog_changed
+from .models import Order, OrderItem
+
+
+class OutOfStock(Exception):
+    """Остатка не хватило; product_ids - товары, которых недостаточно"""
+
+    def __init__(self, product_ids):
+        super().__init__(product_ids)
+        self.product_ids = product_ids
+
+
+def reserve_stock(cart_items):
+    """
+    Списывает остаток по позициям корзины (словарям из Cart.__iter__):
+    на позицию один условный UPDATE ... WHERE stock >= quantity, без
+    SELECT FOR UPDATE. Строки товаров блокируются в порядке id, поэтому
+    одновременные заказы с общими товарами не взаимоблокируются.
+    Вызывать внутри transaction.atomic: при нехватке бросается OutOfStock
+    со всеми недостающими товарами, и откат возвращает уже списанное.
+    Товары без учёта остатка (stock is None при загрузке) пропускаются.
+    Возвращает True, если что-то списано (заказу нужен резерв).
+    """
+    lines = sorted((item['product'].id, item['quantity']) for item in cart_items
+                   if item['product'].stock is not None)
+    short = [product_id for product_id, quantity in lines
+             if not Product.objects.filter(pk=product_id).change_stock(-quantity)]
+    if short:
+        raise OutOfStock(short)
+    if lines and Product.objects.filter(pk__in=[product_id for product_id, _ in lines],
+                                        stock=0).exists():
+        # Товар закончился - in_stock в закэшированных ответах устарел
+        notify_catalog_changed(Product)
+    return bool(lines)
+
+
+def release_stock(lines):
+    """Возвращает остаток по парам (product_id, quantity) в порядке id"""
+    for product_id, quantity in sorted(lines):
+        Product.objects.filter(pk=product_id).change_stock(quantity)
+
+
+def reservation_deadline():
+    return timezone.now() + timedelta(minutes=settings.STOCK_RESERVATION_MINUTES)
+
+
+def release_order(orders, order_id):
+    """
+    Возвращает остаток заказа order_id, если тот ещё входит в orders.
+    Заказ забирается условным UPDATE (reserved_until -> None), поэтому
+    параллельный запуск, удаление или оплата не вернут остаток дважды.
+    Вызывать внутри transaction.atomic. Возвращает True, если вернули.
+    """
+    if not orders.filter(pk=order_id).update(reserved_until=None,
+                                             reservation_released=True):
+        return False
+    release_stock(OrderItem.objects.filter(order_id=order_id)
+                  .values_list('product_id', 'quantity'))
+    return True
+
+
+def release_expired_reservations(now=None):
+    """
+    Возвращает остаток по неоплаченным заказам с истёкшим резервом
+    и помечает их reservation_released. Возвращает число заказов.
+    """
+    now = now or timezone.now()
+    expired = Order.objects.filter(paid=False, reserved_until__lte=now)
+    released = 0
+    for order_id in list(expired.values_list('pk', flat=True)):
+        with transaction.atomic():
+            if release_order(expired, order_id):
+                released += 1
+    if released:
+        # Вернувшийся остаток мог снова сделать товары доступными
+        notify_catalog_changed(Product)
+    return released
+
+
+def renew_reservation(order):
+    """
+    Перед оплатой: если резерв заказа уже снят, списывает остаток заново
+    (тем же reserve_stock) и продлевает резерв. При нехватке бросает
+    OutOfStock, и заказ остаётся со снятым резервом - оплачивать его нельзя.
+    """
+    if not order.reservation_released:
+        return
+    cart_items = [{'product': item.product, 'quantity': item.quantity}
+                  for item in order.items.select_related('product')]
+    deadline = reservation_deadline()
+    with transaction.atomic():
+        # Продлевает только один из параллельных запросов
+        if Order.objects.filter(pk=order.pk, reservation_released=True).update(
+                reservation_released=False, reserved_until=deadline):
+            reserve_stock(cart_items)
+    order.reservation_released = False
+    order.reserved_until = deadline
+
+
+def order_totals(cart_items):
+    """
+    total_cost и item_count будущего заказа по позициям корзины - по тем же
+    ценам со скидкой, что запишет create_order_items (позиции создаются
+    bulk_create без сигналов, поэтому итоги передаются при сохранении заказа)
+    """
+    return {
+        'total_cost': money_sum(item['product'].sell_price() * item['quantity']
+                                for item in cart_items).to_decimal(),
+        'item_count': sum(item['quantity'] for item in cart_items),
+    }
+
+
+def create_order_items(order, cart_items):
+    """
+    Создаёт позиции заказа одним bulk_create по позициям корзины
+    (словарям из Cart.__iter__: товары уже загружены, цена со скидкой
+    считается без запросов). Возвращает созданные позиции.
+    Вызывать внутри transaction.atomic вместе с сохранением заказа.
+    """
+    return OrderItem.objects.bulk_create([
+        OrderItem(order=order,
+                  product=item['product'],
+                  price=item['product'].sell_price().to_decimal(),
+                  quantity=item['quantity'])
+        for item in cart_items
+    ])
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = ('Заполняет total_cost и item_count заказов по их позициям '
+            '(для заказов, созданных до появления этих полей)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько заказов пересчитывать одним UPDATE',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = Order.objects.order_by('pk').values_list('pk', flat=True)
+        updated = 0
+        last_id = 0
+        while True:
+            # Пачки по диапазону id: короткие транзакции, без OFFSET
+            batch = list(ids.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                # updated не трогаем: сами заказы не менялись
+                updated += Order.objects.filter(
+                    pk__gte=batch[0], pk__lte=batch[-1]).update_totals(touch=False)
+            last_id = batch[-1]
+            self.stdout.write(f'Пересчитано заказов: {updated}')
+        self.stdout.write(self.style.SUCCESS(f'Готово, заказов: {updated}'))
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from orders.checkout import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = ('Возвращает на склад остаток, списанный под неоплаченные заказы '
+            'с истёкшим резервом (запускать по cron или с --interval)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Повторять каждые N секунд (0 - один проход)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            released = release_expired_reservations()
+            if released:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Снят резерв с заказов: {released}')
+                )
+            elif not interval:
+                self.stdout.write('Заказов с истёкшим резервом нет')
+            if not interval:
+                return
+            time.sleep(interval)
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_stripe_session_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='reserved_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('paid', False), ('reserved_until__isnull', False)), fields=['reserved_until'], name='orders_order_reserved_idx'),
+        ),
+    ]
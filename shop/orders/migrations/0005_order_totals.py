@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:40
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_totals(apps, schema_editor):
+    # Тот же UPDATE с подзапросами, что и OrderQuerySet.update_totals, но по
+    # историческим моделям; для больших таблиц есть команда
+    # recalculate_order_totals (пачками)
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    Order.objects.update(
+        total_cost=Coalesce(
+            Subquery(items.annotate(total=Sum(F('price') * F('quantity'))).values('total')),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+        item_count=Coalesce(
+            Subquery(items.annotate(count=Sum('quantity')).values('count')),
+            Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_reserved_until'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['total_cost'], name='orders_orde_total_c_fa71d6_idx'),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='reservation_released',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,8 +1,35 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Now
 from main.models import Product
+from main.money import Money
 from users.models import User
 
 
+class OrderQuerySet(models.QuerySet):
+
+    def update_totals(self, touch=True):
+        """
+        Пересчитывает total_cost и item_count по позициям одним UPDATE
+        с подзапросами (без загрузки позиций в Python). touch - обновить
+        и updated: от него зависят ETag'и списка заказов.
+        """
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        changes = {
+            'total_cost': Coalesce(
+                Subquery(items.annotate(total=Sum(F('price') * F('quantity'))).values('total')),
+                Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            'item_count': Coalesce(
+                Subquery(items.annotate(count=Sum('quantity')).values('count')),
+                Value(0)),
+        }
+        if touch:
+            changes['updated'] = Now()
+        return self.update(**changes)
+
+
 class Order(models.Model):
     user = models.ForeignKey(to=User, on_delete=models.SET_DEFAULT,
                              blank=True, null=True, default=None) # Если будет удаляться параметр в форме, вместо него будет ставиться дефолт
@@ -15,6 +42,20 @@ class Order(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     paid = models.BooleanField(default=False)
+    # До этого момента за неоплаченным заказом держится списанный остаток
+    # товаров (None - резерва нет или он уже снят/стал постоянным после оплаты)
+    reserved_until = models.DateTimeField(null=True,
+                                          blank=True)
+    # Резерв истёк и остаток возвращён на склад: перед оплатой его нужно
+    # списать заново (orders.checkout.renew_reservation)
+    reservation_released = models.BooleanField(default=False)
+    # Итоги по позициям хранятся в заказе: списки и сортировка по сумме
+    # читают колонки. Считаются при оформлении (orders.checkout) и
+    # пересчитываются при изменении позиций (orders.signals)
+    total_cost = models.DecimalField(max_digits=12,
+                                     decimal_places=2,
+                                     default=0)
+    item_count = models.PositiveIntegerField(default=0)
 
     stripe_id = models.CharField(
         max_length=250,
@@ -28,11 +69,18 @@ class Order(models.Model):
         help_text="ID сессии Stripe Checkout"
     )
 
+    objects = OrderQuerySet.as_manager()
+
 
     class Meta:
         ordering = ['-created']
         indexes = [
             models.Index(fields=['-created']),
+            models.Index(fields=['total_cost']),
+            models.Index(fields=['reserved_until'],
+                         condition=models.Q(paid=False,
+                                            reserved_until__isnull=False),
+                         name='orders_order_reserved_idx'),
         ]
 
 
@@ -41,7 +89,7 @@ class Order(models.Model):
     
 
     def get_total_cost(self):
-        return sum(item.get_cost() for item in self.items.all())
+        return Money.from_decimal(self.total_cost)
 
     
     def get_stripe_url(self):
@@ -68,4 +116,4 @@ class OrderItem(models.Model):
     
 
     def get_cost(self):
-        return self.price * self.quantity
\ No newline at end of file
+        return Money.from_decimal(self.price) * self.quantity
\ No newline at end of file
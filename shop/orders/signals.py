@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from main.models import Product
+from main.signals import notify_catalog_changed
+from .checkout import release_order
+from .models import Order, OrderItem
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_changed(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Order) or getattr(origin, 'model', None) is Order:
+        # Позиции удаляются каскадом вместе с заказом - пересчитывать нечего
+        return
+    # Пересчёт в БД, а не += в Python: одновременные правки позиций
+    # одного заказа не затрут друг друга. Массовые операции с OrderItem
+    # (bulk_create, update) сигналов не шлют - итоги считает вызывающий код
+    Order.objects.filter(pk=instance.order_id).update_totals()
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    # Позиции ещё не удалены: возвращаем на склад остаток неоплаченного заказа
+    if instance.paid or instance.reserved_until is None:
+        return
+    with transaction.atomic():
+        reserved = Order.objects.filter(paid=False, reserved_until__isnull=False)
+        if release_order(reserved, instance.pk):
+            notify_catalog_changed(Product)
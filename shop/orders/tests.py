@@ -1,3 +1,50 @@
+from datetime import timedelta
+from decimal import Decimal
 from django.test import TestCase
+from django.utils import timezone
+from main.models import Category, Product
+from .checkout import (OutOfStock, create_order_items, release_expired_reservations,
+                       renew_reservation, reservation_deadline, reserve_stock)
+from .models import Order
 
-# Create your tests here.
+
+class StockReservationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Books', slug='books')
+        cls.product = Product.objects.create(category=category, name='Book', slug='book',
+                                             price=Decimal('10.00'), stock=2)
+
+    def place_order(self, quantity):
+        cart_items = [{'product': Product.objects.get(pk=self.product.pk), 'quantity': quantity}]
+        reserve_stock(cart_items)
+        order = Order.objects.create(first_name='a', last_name='b', email='a@example.com',
+                                     city='c', address='d', postal_code='1',
+                                     reserved_until=reservation_deadline())
+        create_order_items(order, cart_items)
+        return order
+
+    def stock(self):
+        return Product.objects.get(pk=self.product.pk).stock
+
+    def test_released_order_is_reserved_again_before_payment(self):
+        order = self.place_order(2)
+        Order.objects.update(reserved_until=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(self.stock(), 2)
+
+        other = self.place_order(1)
+        order.refresh_from_db()
+        self.assertTrue(order.reservation_released)
+        with self.assertRaises(OutOfStock):
+            renew_reservation(order)
+        order.refresh_from_db()
+        self.assertTrue(order.reservation_released)
+
+        other.delete()
+        self.assertEqual(self.stock(), 2)
+        renew_reservation(order)
+        self.assertEqual(self.stock(), 0)
+        order.refresh_from_db()
+        self.assertFalse(order.reservation_released)
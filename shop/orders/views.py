@@ -1,6 +1,8 @@
 from django.shortcuts import render, redirect
 from django.urls import reverse
-from .models import OrderItem
+from django.db import transaction
+from .checkout import (OutOfStock, create_order_items, order_totals,
+                       reservation_deadline, reserve_stock)
 from .forms import OrderCreateForm
 from cart.cart import Cart
 
@@ -10,16 +12,23 @@ def order_create(request):
     if request.method == 'POST':
         form = OrderCreateForm(request.POST, request=request)
         if form.is_valid():
-            order = form.save()
-            for item in cart:
-                discounted_price = item['product'].sell_price()
-                OrderItem.objects.create(order=order,
-                                         product=item['product'],
-                                         price=discounted_price,
-                                         quantity=item['quantity'])
-            cart.clear()
-            request.session['order_id'] = order.id
-            return redirect(reverse('payment:process'))
+            cart_items = list(cart)
+            try:
+                with transaction.atomic():
+                    reserved = reserve_stock(cart_items)
+                    order = form.save(commit=False)
+                    for name, value in order_totals(cart_items).items():
+                        setattr(order, name, value)
+                    if reserved:
+                        order.reserved_until = reservation_deadline()
+                    order.save()
+                    create_order_items(order, cart_items)
+                    cart.clear()
+            except OutOfStock:
+                form.add_error(None, 'Недостаточно товара на складе')
+            else:
+                request.session['order_id'] = order.id
+                return redirect(reverse('payment:process'))
     else:
         form = OrderCreateForm(request=request)
     return render(request,
@@ -1,6 +1,6 @@
 from django.shortcuts import render,redirect, get_object_or_404
 from django.urls import reverse
-from decimal import Decimal
+from orders.checkout import OutOfStock, renew_reservation
 from orders.models import Order
 from django.conf import settings
 import stripe
@@ -16,6 +16,12 @@ def payment_process(request):
     order = get_object_or_404(Order, id=order_id)
 
     if request.method == 'POST':
+        # Резерв истёк и остаток вернулся на склад - списываем заново
+        try:
+            renew_reservation(order)
+        except OutOfStock:
+            error = 'Недостаточно товара на складе'
+            return render(request, 'payment/process.html', locals(), status=409)
         success_url = request.build_absolute_uri(
             reverse('payment:completed')
         )
@@ -33,7 +39,7 @@ def payment_process(request):
             discounted_price = item.product.sell_price()
             session_data['line_items'].append({
                 'price_data': {
-                    'unit_amount': int(discounted_price * Decimal('100')),
+                    'unit_amount': discounted_price.cents,
                     'currency': 'usd',
                     'product_data': {
                         'name': item.product.name,
@@ -2,6 +2,8 @@ import stripe
 from django.conf import settings
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
+from orders.checkout import OutOfStock, renew_reservation
 from orders.models import Order
 from main.models import Product
 import logging
@@ -44,13 +46,26 @@ def stripe_webhook(request):
         if session.mode == 'payment' and session.payment_status == 'paid':
             try:
                 order_id = session.client_reference_id
-                order = Order.objects.get(id=order_id)
-                logger.info(f"📦 STRIPE WEBHOOK: Found order {order.id}, current paid status: {order.paid}")
+                with transaction.atomic():
+                    # Блокировка строки: снятие резерва (release_reservations)
+                    # дождётся оплаты и уже не вернёт остаток этого заказа
+                    order = Order.objects.select_for_update().get(id=order_id)
+                    logger.info(f"📦 STRIPE WEBHOOK: Found order {order.id}, current paid status: {order.paid}")
 
-                # Обновляем статус заказа
-                order.paid = True
-                order.stripe_id = session.payment_intent
-                order.save()
+                    if not order.paid:
+                        try:
+                            # Оплата пришла после снятия резерва - списываем остаток заново
+                            renew_reservation(order)
+                        except OutOfStock as e:
+                            logger.error(f"❌ STRIPE WEBHOOK: Order {order.id} paid after its reservation "
+                                         f"was released, not enough stock for products {e.product_ids}")
+
+                    # Обновляем статус заказа
+                    order.paid = True
+                    # Резерв остатка становится постоянным
+                    order.reserved_until = None
+                    order.stripe_id = session.payment_intent
+                    order.save()
 
                 logger.info(f"✅ STRIPE WEBHOOK: Order {order.id} marked as paid")
 
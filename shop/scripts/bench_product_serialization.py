@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Сравнение стоимости сериализации списка товаров:
+ProductSerializer(many=True) против быстрого пути api.fastpath.
+Работает на объектах в памяти, база данных не нужна.
+
+    python scripts/bench_product_serialization.py
+"""
+import os
+import sys
+import timeit
+from decimal import Decimal
+
+# Настройка Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shop.settings')
+os.environ.setdefault('ALLOWED_HOSTS', 'localhost')
+import django
+django.setup()
+
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from main.models import Category, Product
+from api.serializers import ProductSerializer
+from api.fastpath import product_row_builder
+
+SIZES = (20, 100, 1000)
+REPEAT = 5
+
+request = Request(APIRequestFactory().get('/api/v1/products/', HTTP_HOST='localhost'))
+category = Category(id=1, name='Электроника', slug='electronics')
+now = timezone.now()
+
+
+def make_rows(count):
+    products, values = [], []
+    for i in range(count):
+        product = Product(
+            id=i + 1, category=category, name=f'Товар {i}', slug=f'product-{i}',
+            image=f'products/2025/01/01/product-{i}.jpg',
+            description='Описание товара ' * 5,
+            price=Decimal('199.90'), available=True, created=now, updated=now,
+            discount=Decimal('15.00') if i % 2 else Decimal('0.00'),
+        )
+        product.discounted_price = product.sell_price().to_decimal()
+        products.append(product)
+        values.append({
+            'id': product.id, 'category_id': category.id,
+            'category__name': category.name, 'category__slug': category.slug,
+            'name': product.name, 'slug': product.slug, 'image': product.image.name,
+            'description': product.description, 'price': product.price,
+            'available': product.available, 'stock': product.stock,
+            'created': product.created,
+            'updated': product.updated, 'discount': product.discount,
+            'discounted_price': product.discounted_price,
+        })
+    return products, values
+
+
+def serializer_path(products):
+    return ProductSerializer(products, many=True, context={'request': request}).data
+
+
+def fast_path(values):
+    build = product_row_builder(request)
+    return [build(row) for row in values]
+
+
+def best_per_row(func, arg, rows):
+    timer = timeit.Timer(lambda: func(arg))
+    loops = max(1, 2000 // rows)
+    best = min(timer.repeat(repeat=REPEAT, number=loops)) / loops
+    return best / rows * 1e6
+
+
+print(f'{"строк":>6} | {"ProductSerializer, мкс/строка":>30} | {"fastpath, мкс/строка":>22} | {"ускорение":>9}')
+for size in SIZES:
+    products, values = make_rows(size)
+    # Быстрый путь обязан отдавать тот же JSON
+    assert [dict(item) for item in serializer_path(products)] == fast_path(values)
+    slow = best_per_row(serializer_path, products, size)
+    fast = best_per_row(fast_path, values, size)
+    print(f'{size:>6} | {slow:>30.1f} | {fast:>22.1f} | {slow / fast:>8.1f}x')
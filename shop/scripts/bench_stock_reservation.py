@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Нагрузочная проверка списания остатка: много потоков одновременно
+оформляют заказы на один и тот же товар (orders.checkout.reserve_stock
+в транзакции вместе с заказом и позициями). Проверяет, что продано
+ровно столько, сколько было на складе, и печатает пропускную способность.
+Нужна настоящая БД из настроек (PostgreSQL); тестовые товар и заказы
+удаляются после прогона.
+
+    python scripts/bench_stock_reservation.py --threads 32 --stock 1000
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+# Настройка Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shop.settings')
+os.environ.setdefault('ALLOWED_HOSTS', 'localhost')
+import django
+django.setup()
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from main.models import Category, Product
+from orders.checkout import (OutOfStock, create_order_items, order_totals,
+                             reservation_deadline, reserve_stock)
+from orders.models import Order, OrderItem
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--threads', type=int, default=32)
+parser.add_argument('--stock', type=int, default=1000)
+parser.add_argument('--quantity', type=int, default=1, help='штук в одном заказе')
+args = parser.parse_args()
+
+suffix = uuid.uuid4().hex[:8]
+category = Category.objects.create(name=f'bench-{suffix}', slug=f'bench-{suffix}')
+product = Product.objects.create(category=category, name=f'bench-{suffix}',
+                                 slug=f'bench-{suffix}', price=Decimal('10.00'),
+                                 stock=args.stock)
+
+results = {'sold': 0, 'rejected': 0, 'errors': 0}
+results_lock = threading.Lock()
+start = threading.Barrier(args.threads)
+latencies = []
+
+
+def checkout():
+    # Свой объект на поток: как в запросе, товар загружен из корзины заранее
+    cart_items = [{'product': Product.objects.get(pk=product.pk), 'quantity': args.quantity}]
+    start.wait()
+    sold = rejected = errors = 0
+    own_latencies = []
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    reserve_stock(cart_items)
+                    order = Order.objects.create(
+                        first_name='bench', last_name='bench', email='bench@example.com',
+                        city='bench', address='bench', postal_code='0',
+                        reserved_until=reservation_deadline(),
+                        **order_totals(cart_items))
+                    create_order_items(order, cart_items)
+            except OutOfStock:
+                rejected += 1
+                break
+            except Exception:
+                # Например, разрыв соединения - считаем, но не останавливаем прогон
+                errors += 1
+                if errors > 100:
+                    break
+                continue
+            own_latencies.append(time.perf_counter() - started)
+            sold += 1
+    finally:
+        connection.close()
+    with results_lock:
+        results['sold'] += sold
+        results['rejected'] += rejected
+        results['errors'] += errors
+        latencies.extend(own_latencies)
+
+
+threads = [threading.Thread(target=checkout) for _ in range(args.threads)]
+began = time.perf_counter()
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+elapsed = time.perf_counter() - began
+
+product.refresh_from_db()
+order_ids = list(OrderItem.objects.filter(product=product).values_list('order_id', flat=True))
+ordered = OrderItem.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+expected_orders = args.stock // args.quantity
+
+latencies.sort()
+
+
+def percentile(share):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * share))] * 1000 if latencies else 0.0
+
+
+print(f'потоков: {args.threads}, на складе: {args.stock}, штук в заказе: {args.quantity}')
+print(f'заказов: {results["sold"]} (ожидалось {expected_orders}), отказов: {results["rejected"]}, '
+      f'ошибок: {results["errors"]}')
+print(f'продано штук: {ordered}, остаток: {product.stock}')
+print(f'время: {elapsed:.2f} с, {results["sold"] / elapsed:.0f} заказов/с, '
+      f'p50 {percentile(0.5):.1f} мс, p99 {percentile(0.99):.1f} мс')
+
+try:
+    # Перепродажи нет: продано не больше, чем было, и остаток сходится
+    assert ordered + product.stock == args.stock, 'остаток не сходится с проданным'
+    assert results['sold'] == expected_orders, 'продано не всё, что было на складе'
+    print('OK: перепродажи нет')
+finally:
+    Order.objects.filter(pk__in=order_ids).delete()
+    product.delete()
+    category.delete()
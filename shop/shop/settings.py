@@ -149,11 +149,64 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# В продакшене нужен общий для всех процессов кэш (например, Redis),
+# иначе сброс кэша каталога будет виден только в одном процессе
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Время жизни закэшированных ответов каталога (секунды).
+# Актуальность обеспечивает сброс по сигналам, таймаут - страховка
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', '600'))
+
+# Индекс автодополнения в памяти процесса (main.autocomplete):
+# максимум товаров в индексе (при превышении поиск идёт через БД)
+# и как часто сверяться с изменениями из других процессов (секунды)
+AUTOCOMPLETE_MAX_PRODUCTS = int(os.getenv('AUTOCOMPLETE_MAX_PRODUCTS', '200000'))
+AUTOCOMPLETE_CHECK_INTERVAL = float(os.getenv('AUTOCOMPLETE_CHECK_INTERVAL', '1'))
+
+# Границы ценовых интервалов для фасетов поиска по умолчанию
+# (переопределяются параметром ?price_buckets=)
+SEARCH_PRICE_BUCKETS = [500, 1000, 5000, 10000, 50000]
+SEARCH_MAX_PRICE_BUCKETS = 20
+
+# Кэш страниц поиска в памяти процесса (api.search_cache): число записей
+# и сколько разных запросов учитывать в статистике популярности
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '1000'))
+SEARCH_STATS_MAX_QUERIES = int(os.getenv('SEARCH_STATS_MAX_QUERIES', '10000'))
+
+# Аналитика поиска (main.analytics): события копятся в кольцевом буфере
+# и пачками пишутся фоновым потоком в таблицу SearchEvent
+# или, если задан SEARCH_EVENTS_FILE, в NDJSON-файл
+SEARCH_EVENTS_ENABLED = os.getenv('SEARCH_EVENTS_ENABLED', 'True').lower() == 'true'
+SEARCH_EVENTS_BUFFER_SIZE = int(os.getenv('SEARCH_EVENTS_BUFFER_SIZE', '10000'))
+SEARCH_EVENTS_FLUSH_INTERVAL = float(os.getenv('SEARCH_EVENTS_FLUSH_INTERVAL', '5'))
+SEARCH_EVENTS_BATCH_SIZE = 1000
+SEARCH_EVENTS_FILE = os.getenv('SEARCH_EVENTS_FILE', '')
+
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
 
+# Процессы для фоновой генерации уменьшенных копий изображений товаров
+# (0 - генерировать сразу, в текущем процессе)
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', '2'))
+
 CART_SESSION_ID = 'cart'
 
+# Хранилище корзины: cart.storage.SessionCartStorage (вся корзина в сессии),
+# cart.storage.CacheCartStorage или cart.storage.DatabaseCartStorage
+# (позиции меняются по одной, без перезаписи сессии)
+CART_STORAGE = os.getenv('CART_STORAGE', 'cart.storage.SessionCartStorage')
+CART_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# Сколько минут неоплаченный заказ держит списанный остаток товаров;
+# затем остаток возвращает команда release_reservations
+STOCK_RESERVATION_MINUTES = int(os.getenv('STOCK_RESERVATION_MINUTES', '30'))
+
 AUTH_USER_MODEL = 'users.User'
 
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', '')